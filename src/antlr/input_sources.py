@@ -0,0 +1,103 @@
+import hashlib
+import mmap
+import os
+import zipfile
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from antlr4 import InputStream
+
+ARCHIVE_SUFFIXES = (".jar", ".zip")
+
+# loose files from this size on are decoded straight from a memory map instead of being read into bytes first
+MMAP_THRESHOLD = 1 << 20
+
+
+def decode_file(path) -> str:
+    """decodes a file like `FileStream` does, i.e., as UTF-8 without translating line endings"""
+    if os.path.getsize(path) < MMAP_THRESHOLD:
+        return Path(path).read_bytes().decode("utf8")
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return str(mapped, "utf8")
+
+
+def input_stream(text: str, name: str) -> InputStream:
+    stream = InputStream(text)
+    stream.name = name
+    return stream
+
+
+def shard_of(key: str, count: int) -> int:
+    """
+    Assigns a source to one of `count` shards by hashing its `key`. Unlike `hash`, which is salted per process,
+    the shard is the same on every machine and in every run.
+    """
+    return int.from_bytes(hashlib.sha256(key.encode("utf8")).digest()[:8], "big") % count
+
+
+def source_key(path, source) -> str:
+    """
+    :return: the path of a `source` found by `java_source_texts(path)` relative to `path`, e.g. `p1/Util.java` or
+    `lib.jar!/p1/Util.java`, which is the same on every machine.
+    """
+    path = Path(path)
+    root = path.parent if path.is_file() else path
+    archive, separator, entry = source.partition("!/")
+    return Path(archive).relative_to(root).as_posix() + separator + entry
+
+
+def output_name(path, source) -> str:
+    """
+    :return: the directory of the outputs of a `source` found by `java_source_texts(path)`, its `source_key` without
+    the `.java` suffix, so that same-named sources of different packages do not share it.
+    """
+    key = source_key(path, source)
+    return key[:-len(".java")] if key.endswith(".java") else key
+
+
+def archive_sources(archive, select=None) -> Iterator[Tuple[str, str]]:
+    """
+    Reads the `.java` entries of a zip or jar archive without extracting them to disk.
+
+    :param select: function telling from the name of an entry whether to read it, all entries are read when `None`.
+    :yield: the `archive!/entry` path of each entry and its text.
+    """
+    with zipfile.ZipFile(archive) as zipped:
+        for info in zipped.infolist():
+            if not info.is_dir() and info.filename.endswith(".java") and (select is None or select(info.filename)):
+                yield f"{archive}!/{info.filename}", zipped.read(info).decode("utf8")
+
+
+def java_source_texts(path, shard=None) -> Iterator[Tuple[str, str]]:
+    """
+    Finds the Java sources under `path`, a directory, an archive or a single Java file. Directories are searched
+    recursively for `.java` files and for the `.java` entries of the archives they hold. Each archive is opened
+    once and each source is only read when it is reached.
+
+    :param shard: `(index, count)` to only find the sources of shard `index` out of `count`, see `shard_of`.
+    Sources are assigned by their path relative to `path`, so that the shards do not depend on where the
+    project is found on each machine.
+    :yield: the path of each source and its text.
+    """
+    path = Path(path)
+    if path.is_file():
+        root, files = path.parent, [path]
+    else:
+        root, files = path, sorted(file for file in path.rglob("*")
+                                   if file.suffix == ".java" or file.suffix in ARCHIVE_SUFFIXES and file.is_file())
+
+    def selected(key):
+        return shard is None or shard_of(key, shard[1]) == shard[0]
+
+    for file in files:
+        key = file.relative_to(root).as_posix()
+        if file.suffix in ARCHIVE_SUFFIXES:
+            yield from archive_sources(str(file), lambda entry: selected(f"{key}!/{entry}"))
+        elif file.is_file() and selected(key):
+            yield str(file), decode_file(file)
+
+
+def java_sources(path, shard=None) -> Iterator[Tuple[str, InputStream]]:
+    """like `java_source_texts`, with the input stream of each source in place of its text"""
+    for name, text in java_source_texts(path, shard):
+        yield name, input_stream(text, name)
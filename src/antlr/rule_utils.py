@@ -1,10 +1,54 @@
-from antlr4 import CommonTokenStream, ParserRuleContext
+from typing import List
+from weakref import WeakKeyDictionary
+
+from antlr4 import CommonTokenStream, ParserRuleContext, Token
+from antlr4.xpath.XPath import XPath
 
 from antlr.gen.JavaLexer import JavaLexer
+from antlr.gen.JavaParser import JavaParser
+from src.antlr.token_span import TokenSpan
+
+
+class SourceIndex:
+    """
+    Character offsets of the tokens of a stream, built once per file, to slice the text of a token range
+    straight out of the source instead of joining the texts of its tokens.
+    """
+
+    def __init__(self, token_stream: CommonTokenStream):
+        token_stream.fill()
+        self.token_stream = token_stream
+        tokens = token_stream.tokens
+        self.source = getattr(tokens[0].getInputStream(), "strdata", None) if tokens else None
+        # number of breaks up to each token, where a token does not start right where the previous one stops or
+        # either of them has its text replaced, the text of a range holding a break is not a slice of the source
+        self.breaks, breaks, end, replaced = [], 0, 0, False
+        for token in tokens:
+            if token.start != end or replaced or getattr(token, "_text", None) is not None:
+                breaks += 1
+            end, replaced = token.stop + 1, getattr(token, "_text", None) is not None
+            self.breaks.append(breaks)
+
+    def text(self, start: int, stop: int) -> str:
+        tokens = self.token_stream.tokens
+        if self.source is None or start >= stop or stop >= len(tokens) or tokens[stop].type == Token.EOF or \
+                self.breaks[stop] != self.breaks[start]:
+            return self.token_stream.getText(start, stop)
+        return self.source[tokens[start].start:tokens[stop].stop + 1]
+
+
+_source_indexes = WeakKeyDictionary()
+
+
+def source_index(token_stream: CommonTokenStream) -> SourceIndex:
+    index = _source_indexes.get(token_stream)
+    if index is None or len(index.breaks) != len(token_stream.tokens):
+        index = _source_indexes[token_stream] = SourceIndex(token_stream)
+    return index
 
 
 def extract_exact_text(token_stream: CommonTokenStream, rule: ParserRuleContext) -> str:
-    return token_stream.getText(rule.start.tokenIndex, rule.stop.tokenIndex)
+    return source_index(token_stream).text(rule.start.tokenIndex, rule.stop.tokenIndex)
 
 
 def is_break(rule: ParserRuleContext) -> bool:
@@ -21,3 +65,59 @@ def is_continue(rule: ParserRuleContext) -> bool:
 
 def is_throw(rule: ParserRuleContext) -> bool:
     return rule.start.type == JavaLexer.THROW
+
+
+def skip_annotation(tokens: List[Token], i: int) -> int:
+    """index of the first token after the annotation starting at `i`"""
+    i += 1
+    while i < len(tokens) and tokens[i].type in (JavaLexer.Identifier, JavaLexer.DOT):
+        i += 1
+    if i < len(tokens) and tokens[i].type == JavaLexer.LPAREN:
+        depth = 0
+        for i in range(i, len(tokens)):
+            depth += {JavaLexer.LPAREN: 1, JavaLexer.RPAREN: -1}.get(tokens[i].type, 0)
+            if not depth:
+                return i + 1
+    return i
+
+
+def instantiated_types(tokens: List[Token]) -> List[str]:
+    """texts of the class types in `new T(...)` expressions, like `classOrInterfaceTypeToInstantiate`"""
+    types = []
+    for i, token in enumerate(tokens):
+        if token.type != JavaLexer.NEW:
+            continue
+        j, parts, depth = i + 1, [], 0
+        while j < len(tokens):
+            kind = tokens[j].type
+            if kind == JavaLexer.AT:
+                j = skip_annotation(tokens, j)
+                continue
+            if kind in (JavaLexer.Identifier, JavaLexer.DOT) or depth:
+                depth += {JavaLexer.LT: 1, JavaLexer.GT: -1}.get(kind, 0)
+            elif kind == JavaLexer.LT:
+                depth = 1
+            else:
+                break
+            parts.append(tokens[j].text)
+            j += 1
+        if parts:
+            types.append("".join(parts))
+    return types
+
+
+def thrown_type(rule: ParserRuleContext) -> str:
+    """text of the exception type instantiated by a throw statement"""
+    if isinstance(rule, TokenSpan):
+        return instantiated_types(rule.tokens)[0]
+    return XPath.findAll(rule, "//classOrInterfaceTypeToInstantiate", JavaParser)[0].getText()
+
+
+def caught_type(rule: ParserRuleContext) -> str:
+    """text of the `catchType` of a catch formal parameter"""
+    if isinstance(rule, TokenSpan):
+        tokens, i = rule.tokens, 0
+        while i < len(tokens) and tokens[i].type in (JavaLexer.FINAL, JavaLexer.AT):
+            i = skip_annotation(tokens, i) if tokens[i].type == JavaLexer.AT else i + 1
+        return "".join(token.text for token in tokens[i:-1])
+    return XPath.findAll(rule, "//catchType", JavaParser)[0].getText()
@@ -0,0 +1,22 @@
+from typing import List
+
+from antlr4 import Token
+
+
+class TokenSpan:
+    """
+    A syntactic element given by its range of (default channel) tokens.
+    It can stand in for a `ParserRuleContext` wherever only the boundary tokens and the text are needed,
+    e.g., as a CFG block statement, so that no parse tree has to be built for it.
+    """
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.start = tokens[0]
+        self.stop = tokens[-1]
+
+    def getText(self) -> str:
+        return "".join(token.text for token in self.tokens)
+
+    def __repr__(self):
+        return f"TokenSpan({self.getText()!r})"
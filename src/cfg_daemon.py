@@ -0,0 +1,198 @@
+"""
+A long-running CFG extraction service.
+
+The daemon keeps the ANTLR lexer/parser modules, their warmed-up DFA caches and a result cache resident,
+so repeated calls (IDE plugins, pre-commit hooks) do not pay interpreter startup and parser import costs.
+Requests are JSON objects holding either the `source` text or a `path` to a Java file and are answered
+with the per-method CFGs produced by `src.graph.serialize.cfgs_to_dict`.
+
+Two transports are available:
+    * HTTP on localhost: `POST /extract` with a JSON body, `GET /health`.
+    * A Unix domain socket: one JSON request per line, answered by one JSON line.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from antlr4 import InputStream
+
+from src.cfg_from_stdin import extract
+from src.graph.serialize import cfgs_to_dict
+
+WARMUP_SOURCE = """
+class Warmup {
+    int run(int a) {
+        for (int i = 0; i < a; i++) { if (i > 2) { break; } else { continue; } }
+        while (a > 0) { a--; }
+        switch (a) { case 1: a++; break; default: a--; }
+        try { throw new RuntimeException("x"); } catch (RuntimeException e) { a++; }
+        return a;
+    }
+}
+"""
+
+
+def _warm_up():
+    # the first parse deserializes the ATN and fills the shared DFA caches of the parser
+    extract(InputStream(WARMUP_SOURCE))
+
+
+def extract_source(source: str):
+    funcs, token_stream, end_nodes = extract(InputStream(source))
+    return cfgs_to_dict(funcs, end_nodes, token_stream)
+
+
+class ResultCache:
+    """A thread-safe LRU cache of extraction results keyed by the source content hash."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(source: str) -> str:
+        return hashlib.sha256(source.encode("utf8")).hexdigest()
+
+    def get(self, key):
+        with self.__lock:
+            if key not in self.__items:
+                return None
+            self.__items.move_to_end(key)
+            return self.__items[key]
+
+    def put(self, key, value):
+        with self.__lock:
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.max_size:
+                self.__items.popitem(last=False)
+
+
+class CFGService:
+    """Serves extraction requests from a pool of worker processes that keep the parser resident."""
+
+    def __init__(self, workers=None, cache_size=1024):
+        self.cache = ResultCache(cache_size)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+
+    def handle(self, request: dict) -> dict:
+        # any JSON value may be sent, while only an object with a string source or path is a request
+        if not isinstance(request, dict):
+            raise ValueError(f"request must be a JSON object, not {type(request).__name__}")
+        field = "source" if "source" in request else "path" if "path" in request else None
+        if field is None:
+            raise ValueError("request must contain either 'source' or 'path'")
+        if not isinstance(request[field], str):
+            raise ValueError(f"'{field}' must be a string, not {type(request[field]).__name__}")
+        if field == "source":
+            source = request["source"]
+        else:
+            with open(request["path"], encoding="utf8") as file:
+                source = file.read()
+
+        key = self.cache.key(source)
+        functions = self.cache.get(key)
+        cached = functions is not None
+        if not cached:
+            functions = self.pool.submit(extract_source, source).result()
+            self.cache.put(key, functions)
+        return {"functions": functions, "cached": cached}
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def answer(service: CFGService, payload: bytes):
+    try:
+        return 200, service.handle(json.loads(payload))
+    except (ValueError, OSError) as error:
+        return 400, {"error": str(error)}
+    except Exception as error:
+        return 500, {"error": f"{type(error).__name__}: {error}"}
+
+
+def make_http_handler(service: CFGService):
+    class HTTPHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/health":
+                self.respond(200, {"status": "ok"})
+            else:
+                self.respond(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/extract":
+                self.respond(404, {"error": f"unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            self.respond(*answer(service, self.rfile.read(length)))
+
+        def respond(self, status, body):
+            data = json.dumps(body).encode("utf8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return HTTPHandler
+
+
+def make_socket_handler(service: CFGService):
+    class SocketHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                _, body = answer(service, line)
+                self.wfile.write(json.dumps(body).encode("utf8") + b"\n")
+                self.wfile.flush()
+
+    return SocketHandler
+
+
+def serve(service: CFGService, host="127.0.0.1", port=8765, socket_path=None):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, make_socket_handler(service))
+    else:
+        server = ThreadingHTTPServer((host, port), make_http_handler(service))
+
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CFG extraction requests over localhost HTTP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8765, help="HTTP port to bind (default: %(default)s)")
+    parser.add_argument("--socket", dest="socket_path", help="serve on this Unix socket path instead of HTTP")
+    parser.add_argument("--workers", type=int, default=None, help="number of extraction worker processes")
+    parser.add_argument("--cache-size", type=int, default=1024, help="number of cached extraction results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = CFGService(workers=args.workers, cache_size=args.cache_size)
+    serve(service, host=args.host, port=args.port, socket_path=args.socket_path)
+
+
+if __name__ == '__main__':
+    main()
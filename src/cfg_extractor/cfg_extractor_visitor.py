@@ -1,8 +1,10 @@
-from functools import reduce
 from antlr.gen.JavaParser import JavaParser
 from antlr.gen.JavaParserVisitor import JavaParserVisitor
+from src.cfg_extractor.method_keys import default_channel, method_key, parameter_types
 from src.data_structures.graph.networkx_builder import NxDiGraphBuilder as DiGraphBuilder
 from src.cfg_extractor.language_structure.digraph_embedder import DiGraphEmbedder
+from src.cfg_extractor.straight_line import body_tokens, straight_line_statements, straight_line_cfg
+from src import profiling
 
 
 class CFGExtractorVisitor(JavaParserVisitor):
@@ -16,25 +18,90 @@ class CFGExtractorVisitor(JavaParserVisitor):
     def __init__(self):
         """
         `functions` is a dictionary to keep each function signature and its CFG reference.
-        Each CFG is kept as a `networkx.DiGraph`.
+        Each CFG is kept as a `networkx.DiGraph`, keyed by the qualified key of its method (see `method_keys`),
+        and holds the deepest nesting of control statements in its method under `graph["nesting_depth"]` and
+        the number of whole graph copies made while building it under `graph["graph_copies"]`.
         """
         self.Class = {}
         self.functions = {}
         self.functionLastNode = {}
         self.catches = []
+        # names of the classes being visited, outermost first
+        self.classes = []
+        self.nesting = self.max_nesting = 0
+
+    def visit_type(self, ctx):
+        """visits a type declaration, qualifying the keys of its methods with its name"""
+        self.classes.append(ctx.typeIdentifier().getText())
+        self.visitChildren(ctx)
+        self.classes.pop()
+
+    def visitNormalClassDeclaration(self, ctx: JavaParser.NormalClassDeclarationContext):
+        self.visit_type(ctx)
+
+    def visitEnumDeclaration(self, ctx: JavaParser.EnumDeclarationContext):
+        self.visit_type(ctx)
+
+    def visitRecordDeclaration(self, ctx: JavaParser.RecordDeclarationContext):
+        self.visit_type(ctx)
+
+    def visitNormalInterfaceDeclaration(self, ctx: JavaParser.NormalInterfaceDeclarationContext):
+        self.visit_type(ctx)
+
+    def visitAnnotationInterfaceDeclaration(self, ctx: JavaParser.AnnotationInterfaceDeclarationContext):
+        self.visit_type(ctx)
 
     def visitMethodDeclaration(self, ctx: JavaParser.MethodDeclarationContext):
-        gin = self.visit(ctx.methodBody())
         name = self.visit(ctx.methodHeader())
-        graph, self.functionLastNode[name] = DiGraphEmbedder.embed_in_function(gin, self.catches)
+        with profiling.unit(name):
+            self.extract_function(name, ctx.methodBody())
+
+    def extract_function(self, name: str, body: JavaParser.MethodBodyContext):
+        """
+        Builds the CFG of a single method body and records it under `name`.
+        A body parsed on its own (i.e., with the `methodBody` entry rule) can be passed directly.
+        Bodies without any control flow are detected on their tokens and skip the embedding machinery.
+        """
+        copies = DiGraphBuilder.copies
+        # the methods of local classes are extracted while visiting the body of their enclosing method
+        outer_nesting = self.nesting, self.max_nesting
+        self.nesting = self.max_nesting = 0
+        tokens = body_tokens(body.parser.getTokenStream().tokens, body.start.tokenIndex, body.stop.tokenIndex)
+        statements = straight_line_statements(tokens)
+        if statements is not None:
+            graph, self.functionLastNode[name] = straight_line_cfg(statements)
+        else:
+            gin = self.visit(body)
+            graph, self.functionLastNode[name] = DiGraphEmbedder.embed_in_function(gin, self.catches)
+            self.catches = []
         self.functions[name] = graph.build()
-        self.catches = []
+        self.functions[name].graph["nesting_depth"] = self.max_nesting
+        self.functions[name].graph["graph_copies"] = DiGraphBuilder.copies - copies
+        self.nesting, self.max_nesting = outer_nesting
+
+    def visit_nested(self, ctx):
+        """visits the body of a control statement, one nesting level deeper"""
+        self.nesting += 1
+        self.max_nesting = max(self.max_nesting, self.nesting)
+        graph = self.visit(ctx)
+        self.nesting -= 1
+        return graph
+
+    def visit_else(self, ctx):
+        """visits the else part of an if statement, which is only nested when it is not another if, `else if`"""
+        if isinstance(ctx.getChild(0), (JavaParser.IfThenStatementContext, JavaParser.IfThenElseStatementContext,
+                                        JavaParser.IfThenElseStatementNoShortIfContext)):
+            return self.visit(ctx)
+        return self.visit_nested(ctx)
 
     def visitMethodHeader(self, ctx: JavaParser.MethodHeaderContext):
         return self.visit(ctx.methodDeclarator())
 
     def visitMethodDeclarator(self, ctx: JavaParser.MethodDeclaratorContext):
-        return ctx.Identifier().getText()
+        parameters = ctx.formalParameterList()
+        tokens = [] if parameters is None else default_channel(
+            ctx.parser.getTokenStream().tokens[parameters.start.tokenIndex:parameters.stop.tokenIndex + 1])
+        return method_key(self.classes, ctx.Identifier().getText(), parameter_types(tokens))
 
     def visitBlock(self, ctx: JavaParser.BlockContext):
         if ctx.blockStatements() is not None:
@@ -42,20 +109,20 @@ class CFGExtractorVisitor(JavaParserVisitor):
 
     def visitBlockStatements(self, ctx: JavaParser.BlockStatementsContext):
         gins = (self.visit(block) for block in ctx.blockStatement())
-        return reduce(DiGraphEmbedder.merge, gins)
+        return DiGraphEmbedder.merge_sequence(gins)
 
     def visitIfThenStatement(self, ctx: JavaParser.IfThenStatementContext):
         condition = ctx.expression()
         then_part = ctx.statement()
-        then_part_graph = self.visit(then_part)
+        then_part_graph = self.visit_nested(then_part)
         return DiGraphEmbedder.embed_in_if(condition, then_part_graph)
 
     def visitIfThenElseStatement(self, ctx: JavaParser.IfThenElseStatementContext):
         condition = ctx.expression()
         then_part = ctx.statementNoShortIf()
         else_part = ctx.statement()
-        then_part_graph = self.visit(then_part)
-        else_part_graph = self.visit(else_part)
+        then_part_graph = self.visit_nested(then_part)
+        else_part_graph = self.visit_else(else_part)
         return DiGraphEmbedder.embed_in_if_else(condition, then_part_graph, else_part_graph)
 
     def visitSwitchStatement(self, ctx: JavaParser.SwitchStatementContext):
@@ -64,7 +131,7 @@ class CFGExtractorVisitor(JavaParserVisitor):
         return DiGraphEmbedder.embed_in_switch_case(switcher, case_labels, case_bodies)
 
     def visitSwitchBlock(self, ctx: JavaParser.SwitchBlockContext):
-        return [self.visit(switch_group) for switch_group in ctx.switchBlockStatementGroup()]
+        return [self.visit_nested(switch_group) for switch_group in ctx.switchBlockStatementGroup()]
 
     def visitSwitchBlockStatementGroup(self, ctx: JavaParser.SwitchBlockStatementGroupContext):
         case = ctx.switchLabel()
@@ -75,22 +142,22 @@ class CFGExtractorVisitor(JavaParserVisitor):
         initializer = ctx.forInit()
         condition = ctx.expression()
         successor = ctx.forUpdate()
-        body_graph = self.visit(ctx.statement())
+        body_graph = self.visit_nested(ctx.statement())
         return DiGraphEmbedder.embed_in_for(condition, initializer, successor, body_graph)
 
     def visitWhileStatement(self, ctx: JavaParser.WhileStatementContext):
         condition = ctx.expression()
-        body_graph = self.visit(ctx.statement())
+        body_graph = self.visit_nested(ctx.statement())
         return DiGraphEmbedder.embed_in_while(condition, body_graph)
 
     def visitDoStatement(self, ctx: JavaParser.DoStatementContext):
         condition = ctx.expression()
         do_body = ctx.statement()
-        do_body_graph = self.visit(do_body)
+        do_body_graph = self.visit_nested(do_body)
         return DiGraphEmbedder.embed_in_do_while(condition, do_body_graph)
 
     def visitTryStatement(self, ctx: JavaParser.TryStatementContext):
-        try_body = self.visit(ctx.block())
+        try_body = self.visit_nested(ctx.block())
         catch_exceptions, catch_bodies = zip(*self.visit(ctx.catches()))
         embeded_graph, self.catches = DiGraphEmbedder.embed_in_try_catch(try_body, catch_exceptions, catch_bodies)
         return embeded_graph
@@ -99,7 +166,7 @@ class CFGExtractorVisitor(JavaParserVisitor):
         return [self.visit(catches) for catches in ctx.catchClause()]
 
     def visitCatchClause(self, ctx: JavaParser.CatchClauseContext):
-        catch_body = self.visit(ctx.block())
+        catch_body = self.visit_nested(ctx.block())
         exception = ctx.catchFormalParameter()
         return exception, catch_body
 
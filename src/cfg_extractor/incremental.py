@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+
+from antlr4 import CommonTokenStream
+
+from antlr.gen.JavaLexer import JavaLexer
+from antlr.gen.JavaParser import JavaParser
+from src.antlr.input_sources import decode_file, input_stream
+from src.cfg_extractor.cfg_extractor_visitor import CFGExtractorVisitor
+from src.cfg_extractor.method_spans import find_method_spans
+from src.cfg_extractor.straight_line import body_tokens, straight_line_statements, straight_line_cfg
+from src.graph.serialize import cfgs_to_dict
+from src import profiling
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
+
+
+def shift_lines(cfg: dict, delta: int) -> dict:
+    """move the statement line numbers of a serialized CFG by `delta` lines"""
+    if not delta:
+        return cfg
+    nodes = [{**node, "statements": [{**st, "line": st["line"] + delta, "end_line": st["end_line"] + delta}
+                                     for st in node["statements"]]}
+             for node in cfg["nodes"]]
+    return {**cfg, "nodes": nodes}
+
+
+class IncrementalExtractor:
+    """
+    Re-extracts only the methods whose source text changed since the previous run.
+    For every file, the span, content hash and serialized CFGs of each method are kept in a state
+    directory. Methods with an unchanged hash reuse their stored CFGs, while changed methods are parsed
+    on their own with the `methodBody` entry rule instead of a whole `compilationUnit`.
+    Changed methods without control flow are built from their tokens and are not parsed at all.
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+    def state_path(self, file) -> str:
+        return os.path.join(self.state_dir, content_hash(os.path.abspath(file)) + ".json")
+
+    def load_state(self, file):
+        try:
+            with open(self.state_path(file), encoding="utf8") as state:
+                return json.load(state)["methods"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def save_state(self, file, methods):
+        path = self.state_path(file)
+        with open(path + ".tmp", "w", encoding="utf8") as state:
+            json.dump({"path": os.path.abspath(file), "methods": methods}, state)
+        os.replace(path + ".tmp", path)
+
+    def extract_file(self, file):
+        """
+        Extracts the CFGs of the methods that changed in `file`.
+
+        :return: the same triple as `extract`, holding the changed methods only.
+        """
+        return self.extract(input_stream(decode_file(file), file), file)
+
+    def extract(self, stream, file):
+        lexer = JavaLexer(stream)
+        token_stream = CommonTokenStream(lexer)
+        parser = JavaParser(token_stream)
+
+        previous = {}
+        for method in self.load_state(file):
+            previous.setdefault(method["hash"], []).append(method)
+
+        methods = []
+        funcs, end_nodes = {}, {}
+        for span in find_method_spans(token_stream):
+            digest = content_hash(stream.getText(span.start, span.stop))
+            if previous.get(digest):
+                old = previous[digest].pop(0)
+                methods.append({**old, "line": span.line, "span": [span.start, span.stop],
+                                "cfgs": {name: shift_lines(cfg, span.line - old["line"])
+                                         for name, cfg in old["cfgs"].items()}})
+                continue
+
+            statements = straight_line_statements(
+                body_tokens(token_stream.tokens, span.body_start.tokenIndex, span.body_stop.tokenIndex))
+            key = span.key
+            if statements is not None:
+                graph, end_nodes[key] = straight_line_cfg(statements)
+                funcs[key] = graph.build()
+                funcs[key].graph["nesting_depth"] = funcs[key].graph["graph_copies"] = 0
+                cfgs = cfgs_to_dict({key: funcs[key]}, end_nodes, token_stream)
+            else:
+                parser.reset()
+                token_stream.seek(span.body_start.tokenIndex)
+                cfg_extractor = CFGExtractorVisitor()
+                cfg_extractor.classes = list(span.classes)
+                with profiling.unit(key):
+                    cfg_extractor.extract_function(key, parser.methodBody())
+                funcs.update(cfg_extractor.functions)
+                end_nodes.update(cfg_extractor.functionLastNode)
+                cfgs = cfgs_to_dict(cfg_extractor.functions, cfg_extractor.functionLastNode, token_stream)
+            methods.append({"name": key, "line": span.line, "span": [span.start, span.stop],
+                            "hash": digest, "cfgs": cfgs})
+
+        self.save_state(file, methods)
+        return funcs, token_stream, end_nodes
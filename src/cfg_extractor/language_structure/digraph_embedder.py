@@ -1,13 +1,11 @@
-from typing import List, Tuple, Any, Union
+from typing import List, Tuple, Any, Union, Iterable
 from antlr4 import RuleContext
 from data_structures.graph.builder_interface import IDiGraphBuilder
 from src.cfg_extractor.language_structure.structure_pattern_interface import ILanguagePattern
 from src.data_structures.graph.builder_interface import IDiGraphBuilder
 from src.data_structures.graph.networkx_builder import NxDiGraphBuilder as DiGraphBuilder
 from enum import Enum, auto
-from src.antlr.rule_utils import is_break, is_return, is_continue, is_throw, extract_exact_text
-from src.antlr.gen.JavaParser import JavaParser
-from antlr4.xpath.XPath import XPath
+from src.antlr.rule_utils import is_break, is_return, is_continue, is_throw, thrown_type, caught_type
 from functools import reduce
 import operator
 
@@ -21,7 +19,7 @@ class DiGraphEmbedder(ILanguagePattern):
 
     @classmethod
     def concat(cls, left: IDiGraphBuilder, right: IDiGraphBuilder) -> IDiGraphBuilder:
-        right = right >> len(left)
+        right = right >> left.last + 1
 
         g = (DiGraphBuilder()
              .add_nodes_from([(left.last, []), (right.head, [])])
@@ -31,11 +29,15 @@ class DiGraphEmbedder(ILanguagePattern):
     @classmethod
     def merge(cls, left: IDiGraphBuilder, right: IDiGraphBuilder) -> IDiGraphBuilder:
         if right is not None:
-            right = right >> len(left) - 1
+            right = right >> left.last
             return left | right
         else:
             return left
 
+    @classmethod
+    def merge_sequence(cls, graphs: Iterable[IDiGraphBuilder]) -> IDiGraphBuilder:
+        return DiGraphBuilder.merge_sequence(graphs)
+
     @classmethod
     def embed_in_if(cls, condition: RuleContext, then_part: "IDiGraphBuilder"):
         g_head = 0
@@ -53,7 +55,7 @@ class DiGraphEmbedder(ILanguagePattern):
         g_head = 0
         g = DiGraphBuilder().add_node(g_head, value=[condition])
         then_part = then_part >> len(g)
-        else_part = else_part >> len(g) + len(then_part)
+        else_part = else_part >> then_part.last + 1
         g = g | then_part | else_part
         g_last = g.last + 1
         g.add_node(g_last, value=[])
@@ -169,82 +171,90 @@ class DiGraphEmbedder(ILanguagePattern):
                            exceptions: List[RuleContext],
                            catch_bodies: List["IDiGraphBuilder"]):
         catches = []
-        g = DiGraphBuilder()
-        g = g | try_body
         for catch, exception in zip(catch_bodies, exceptions):
             catches.extend([(catch, exception)])
-        return cls.__split_on_throw(g, catches)
+        g, catches = cls.__split_on_throw(try_body, catches)
+        # the enclosing patterns shift graphs by their size, so the nodes pruned after throws must leave no gaps
+        g.reset_node_order()
+        return g, catches
 
     @classmethod
     def __resolve_null_node(cls, graph: IDiGraphBuilder, catches, lastNodes):
         # this is a list to store end nodes for graphviz
         newLastNodes = lastNodes
 
+        # the graph is changed in place, so the predecessors are tracked in the order of a fresh copy of it
+        predecessors = {node: {} for node in graph.node_keys}
+        for f, t in graph.edge_keys:
+            predecessors[t][f] = None
+
         # remove null nodes
-        h = graph.copy()
-        for node, data in graph.node_items:
-            if not data:
-                # get previous, next, and edges for null node
-                predecessors = list(h.predecessors(node))
-                successors = list(h.successors(node))
-                edges = sorted(h.edge_items)
-                if successors:
-                    for pred in predecessors:
-                        for s in successors:
-                            # connect previous node to next node
-                            h.add_edges_from([(pred, s, edge_label) for edge_nodes, edge_label in edges if edge_nodes == (pred, node)])
-                            if (node, s) in edges:
-                                h.remove_edge(node, s)
-
-                        h.remove_edge(pred, node)
-                else:
-                    # if node doesn't have next node, recognize it as end node
-                    for pred in predecessors:
-                        newLastNodes.extend([(pred, [h[pred], edge_label]) for edge_nodes, edge_label in edges if edge_nodes == (pred, node)])
-                        h.remove_edge(pred, node)
-
-                h.remove_node(node)
-
-        h.reset_node_order()
-        newLastNodes = h.reset_list_order(newLastNodes)
-        h_length = len(h)
+        for node in [node for node, data in graph.node_items if not data]:
+            # get previous, next, and edges for null node
+            preds = list(predecessors[node])
+            successors = list(graph.successors(node))
+            if successors:
+                for pred in preds:
+                    edge_label = graph[pred, node]
+                    for s in successors:
+                        # connect previous node to next node
+                        graph.add_edge(pred, s, edge_label)
+                        predecessors[s][pred] = None
+
+                    graph.remove_edge(pred, node)
+                    del predecessors[node][pred]
+            else:
+                # if node doesn't have next node, recognize it as end node
+                for pred in preds:
+                    newLastNodes.extend([(pred, [graph[pred], graph[pred, node]])])
+                    graph.remove_edge(pred, node)
+                    del predecessors[node][pred]
+
+            for s in successors:
+                predecessors[s].pop(node, None)
+            del predecessors[node]
+            graph.remove_node(node)
+
+        newLastNodes = graph.reset_list_order(newLastNodes)
         for catch in catches:
-            tmp = catch[0] >> h_length
-            h = h | tmp
-            h_length += len(tmp)
-            h = cls.__resolve_catch_null_nodes(h)
+            tmp = catch[0] >> cls.__next_label(graph)
+            graph.compose(tmp)
+            cls.__resolve_catch_null_nodes(graph, list(tmp.node_keys))
 
-        return h, newLastNodes
+        # labels are made contiguous once, after all the passes
+        mapping = graph.reset_node_order()
+        return graph, [(mapping.get(node, node), edge_label) for node, edge_label in newLastNodes]
 
     @classmethod
-    def __resolve_catch_null_nodes(cls, graph: IDiGraphBuilder):
-        h = graph.copy()
-        for node, data in graph.node_items:
-            if not data:
-                # get previous, next, and edges for null node
-                sucss = list(graph.successors(node))
-                edges = sorted([edge for edge in graph.edge_items if node in edge[0]], key=lambda d: d[0][0])
-                for edge in edges:
-                    if edge[0][1] == node:
-                        if sucss:
-                            # connect previous node to next node
-                            h.add_edges_from([(edge[0][0], s, edge[1].getText()) for s in sucss])
-                            h.remove_edge(edge[0][0], node)
-                            h.remove_edges_from([(node, s) for s in sucss])
+    def __resolve_catch_null_nodes(cls, graph: IDiGraphBuilder, nodes):
+        # all null nodes are resolved against the graph as it was before any of them is removed
+        null_nodes = [(node,
+                       list(graph.successors(node)),
+                       sorted([edge for edge in graph.edge_items if node in edge[0]], key=lambda d: d[0][0]))
+                      for node in nodes if not graph[node]]
+        for node, sucss, edges in null_nodes:
+            for edge in edges:
+                if edge[0][1] == node:
+                    if sucss:
+                        # connect previous node to next node
+                        graph.add_edges_from([(edge[0][0], s, edge[1].getText()) for s in sucss])
+                        graph.remove_edge(edge[0][0], node)
+                        graph.remove_edges_from([(node, s) for s in sucss])
 
-                        else:
-                            # if node doesn't have next node, recognize it as end node
-                            h.remove_edge(edge[0][0], node)
+                    else:
+                        # if node doesn't have next node, recognize it as end node
+                        graph.remove_edge(edge[0][0], node)
 
-                h.remove_node(node)
+            graph.remove_node(node)
 
-        h.reset_node_order()
-        return h
+    @classmethod
+    def __next_label(cls, graph: IDiGraphBuilder):
+        # labels may have gaps until the function graph is relabeled, so new nodes go after the last one
+        return graph.last + 1 if len(graph) else 0
 
     @classmethod
     def embed_in_function(cls, body: "IDiGraphBuilder", catches):
-        g = DiGraphBuilder()
-        g = g | body if body is not None else g.add_node(0, [])
+        g = body if body is not None else DiGraphBuilder().add_node(0, [])
         g, catches = cls.__split_on_throw(g, [])
         g, lastNodes = cls.__split_on_return(g)
         return cls.__resolve_null_node(g, catches, lastNodes)
@@ -264,46 +274,43 @@ class DiGraphEmbedder(ILanguagePattern):
     @classmethod
     def __split_on_throw(cls, graph: "IDiGraphBuilder", catches):
         free_catches = []
-        throwFlag = False
-        h = graph.copy()
-        for label, data in graph.node_items:
-            for ctx in data:
-                if is_throw(ctx):
-                    throwFlag = True
-                    catch_matched = False
-                    h.remove_nodes_from(graph.descendants(label))
-                    if catches:
-                        for catch in catches:
-                            if XPath.findAll(catch[1], "//catchType", JavaParser)[0].getText() == \
-                                    XPath.findAll(ctx, "//classOrInterfaceTypeToInstantiate", JavaParser)[0].getText():
-                                tmp = catch[0] >> len(h)
-                                h = h | tmp
-                                h.add_edge(label, tmp.head, catch[1].getText())
-                                catch_matched = True
-                            else:
-                                free_catches.extend([(catch[0], None)])
+        throws = [(label, data, ctx) for label, data in graph.node_items for ctx in data if is_throw(ctx)]
+        if throws:
+            # the control flow stops at every throw, and whatever can no longer be reached from the entry is removed
+            graph.remove_edges_from([(label, successor) for label in {label for label, _, _ in throws}
+                                     for successor in list(graph.successors(label))])
+            reachable = graph.descendants(graph.head) | {graph.head}
+            graph.remove_nodes_from([node for node in graph.node_keys if node not in reachable])
+            throws = [(label, data, ctx) for label, data, ctx in throws if label in reachable]
+        for label, data, ctx in throws:
+            catch_matched = False
+            if catches:
+                for catch in catches:
+                    if caught_type(catch[1]) == thrown_type(ctx):
+                        tmp = catch[0] >> cls.__next_label(graph)
+                        graph.compose(tmp)
+                        graph.add_edge(label, tmp.head, catch[1].getText())
+                        catch_matched = True
+                    else:
+                        free_catches.extend([(catch[0], None)])
 
-                        if not catch_matched:
-                            h_last_node = len(h)
-                            h.add_node(h_last_node, [])
-                            h.add_edge(label, h_last_node,
-                                       XPath.findAll(ctx, "//classOrInterfaceTypeToInstantiate", JavaParser)[
-                                           0].getText())
+                if not catch_matched:
+                    h_last_node = cls.__next_label(graph)
+                    graph.add_node(h_last_node, [])
+                    graph.add_edge(label, h_last_node, thrown_type(ctx))
 
 
-                    else:
-                        h_last_node = len(h)
-                        h.add_node(h_last_node, [])
-                        h.add_edge(label, h_last_node,
-                                   XPath.findAll(ctx, "//classOrInterfaceTypeToInstantiate", JavaParser)[0].getText())
+            else:
+                h_last_node = cls.__next_label(graph)
+                graph.add_node(h_last_node, [])
+                graph.add_edge(label, h_last_node, thrown_type(ctx))
 
-                    h[label] = data[:data.index(ctx) + 1]
+            graph[label] = data[:data.index(ctx) + 1]
 
-        if not throwFlag and catches:
+        if not throws and catches:
             free_catches.extend(catches)
 
-        h.reset_node_order()
-        return h, free_catches
+        return graph, free_catches
 
     @classmethod
     def __direct_nodes_to_if(cls,
@@ -311,26 +318,26 @@ class DiGraphEmbedder(ILanguagePattern):
                              target_node,
                              jump_statement):
         lastNodes = []
-        h = graph.copy()
-        for label, data in graph.node_items:
+        jumps = [(label, data) for label, data in graph.node_items if any(ctx and jump_statement(ctx) for ctx in data)]
+        for label, data in jumps:
+            successors = list(graph.successors(label))
             for ctx in data:
                 if ctx:
                     if jump_statement(ctx):
-                        if list(graph.successors(label)):
-                            h.remove_edges_from([(label, successor) for successor in graph.successors(label)])
+                        if successors:
+                            graph.remove_edges_from([(label, successor) for successor in successors])
                             if target_node is None:
                                 lastNodes.extend([(label, [data, None])])
                             else:
-                                h.add_edge(label, target_node)
-                                h[label] = data[:data.index(ctx)]
+                                graph.add_edge(label, target_node)
+                                graph[label] = data[:data.index(ctx)]
 
                         else:
                             if target_node is None:
                                 lastNodes.extend([(label, [data, None])])
-                                h[label] = data[:data.index(ctx) + 1]
+                                graph[label] = data[:data.index(ctx) + 1]
 
-        h.reset_node_order()
         if target_node is None:
-            return h, lastNodes
+            return graph, lastNodes
         else:
-            return h
+            return graph
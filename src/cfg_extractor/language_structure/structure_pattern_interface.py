@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import List, Iterable
 
 from src.antlr.gen.JavaParser import RuleContext
 from src.data_structures.graph.builder_interface import IDiGraphBuilder
@@ -21,6 +21,11 @@ class ILanguagePattern(metaclass=abc.ABCMeta):
               right: IDiGraphBuilder) -> IDiGraphBuilder:
         """merge two graphs affront nodes"""
 
+    @classmethod
+    @abc.abstractmethod
+    def merge_sequence(cls, graphs: Iterable[IDiGraphBuilder]) -> IDiGraphBuilder:
+        """merge a sequence of graphs affront nodes at once"""
+
     @classmethod
     @abc.abstractmethod
     def embed_in_if(cls,
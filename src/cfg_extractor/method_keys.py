@@ -0,0 +1,83 @@
+"""
+Qualified method keys, e.g. `Outer.Inner.find(int,List<String>)`, which tell apart overloads and same-named
+methods of different classes. Both frontends build them from the default channel tokens of the formal parameters,
+so that they yield the same keys.
+"""
+import re
+from typing import List, Sequence
+
+from antlr4 import Token
+
+from antlr.gen.JavaLexer import JavaLexer
+
+# characters kept out of output paths, which are invalid in file names on some platforms
+UNSAFE_PATH_CHARACTERS = re.compile(r'[<>:"/\\|?*\s]')
+
+
+def split_parameters(tokens: List[Token]) -> List[List[Token]]:
+    """splits the tokens of a formal parameter list on the commas outside type arguments and annotation arguments"""
+    parameters, current, depth = [], [], 0
+    for token in tokens:
+        if token.type in (JavaLexer.LT, JavaLexer.LPAREN):
+            depth += 1
+        elif token.type in (JavaLexer.GT, JavaLexer.RPAREN):
+            depth -= 1
+        elif token.type == JavaLexer.COMMA and not depth:
+            parameters.append(current)
+            current = []
+            continue
+        current.append(token)
+    if current:
+        parameters.append(current)
+    return parameters
+
+
+def without_annotations(tokens: List[Token]) -> List[Token]:
+    kept, i = [], 0
+    while i < len(tokens):
+        if tokens[i].type != JavaLexer.AT:
+            kept.append(tokens[i])
+            i += 1
+            continue
+        # `@` then a possibly qualified name, then possibly parenthesized arguments
+        i += 2
+        while i + 1 < len(tokens) and tokens[i].type == JavaLexer.DOT:
+            i += 2
+        if i < len(tokens) and tokens[i].type == JavaLexer.LPAREN:
+            depth = 0
+            while i < len(tokens):
+                depth += {JavaLexer.LPAREN: 1, JavaLexer.RPAREN: -1}.get(tokens[i].type, 0)
+                i += 1
+                if not depth:
+                    break
+    return kept
+
+
+def parameter_types(tokens: List[Token]) -> List[str]:
+    """
+    :param tokens: default channel tokens between the parentheses of a method declarator.
+    :return: the type of each formal parameter, without annotations, modifiers and names, e.g. `String...`.
+    The receiver parameter, which is not part of the signature, is left out.
+    """
+    types = []
+    for parameter in split_parameters(tokens):
+        parameter = [token for token in without_annotations(parameter) if token.type != JavaLexer.FINAL]
+        if not parameter or parameter[-1].type == JavaLexer.THIS:
+            continue
+        # the name is the last identifier, possibly followed by the dimensions of old style arrays, `int a[]`
+        name = max(i for i, token in enumerate(parameter) if token.type == JavaLexer.Identifier)
+        types.append("".join(token.text for token in parameter[:name] + parameter[name + 1:]))
+    return types
+
+
+def method_key(classes: Sequence[str], name: str, parameters: Sequence[str]) -> str:
+    return ".".join([*classes, f"{name}({','.join(parameters)})"])
+
+
+def path_name(key: str) -> str:
+    """a file name for the outputs of a method, e.g. `Outer.find(int,List_String_)`"""
+    return UNSAFE_PATH_CHARACTERS.sub("_", key)
+
+
+def default_channel(tokens: List[Token]) -> List[Token]:
+    return [token for token in tokens if token.channel == Token.DEFAULT_CHANNEL]
@@ -0,0 +1,174 @@
+from typing import List, NamedTuple
+
+from antlr4 import CommonTokenStream, Token
+
+from antlr.gen.JavaLexer import JavaLexer
+from src.cfg_extractor.method_keys import method_key, parameter_types
+
+CLASS, METHOD, BLOCK = range(3)
+
+TYPE_KEYWORDS = {JavaLexer.CLASS, JavaLexer.INTERFACE, JavaLexer.ENUM, JavaLexer.RECORD}
+
+# the bodies of these types hold interface method declarations, which have no CFG of their own
+INTERFACE_KEYWORDS = {JavaLexer.INTERFACE, JavaLexer.AT}
+
+# tokens that may precede a method name, i.e., the end of a result type
+RESULT_TYPE_ENDINGS = {JavaLexer.Identifier, JavaLexer.VOID, JavaLexer.GT, JavaLexer.RBRACK,
+                       JavaLexer.BOOLEAN, JavaLexer.BYTE, JavaLexer.CHAR, JavaLexer.SHORT,
+                       JavaLexer.INT, JavaLexer.LONG, JavaLexer.FLOAT, JavaLexer.DOUBLE}
+
+# tokens of the class type in a class instance creation expression, e.g., `new a.B<C>`
+INSTANTIATED_TYPE_TOKENS = {JavaLexer.Identifier, JavaLexer.DOT, JavaLexer.LT, JavaLexer.GT,
+                            JavaLexer.COMMA, JavaLexer.QUESTION, JavaLexer.AT}
+
+# tokens allowed between the closing parenthesis of a method header and its body
+HEADER_TRAILERS = {JavaLexer.THROWS, JavaLexer.Identifier, JavaLexer.DOT, JavaLexer.COMMA, JavaLexer.AT,
+                   JavaLexer.LT, JavaLexer.GT, JavaLexer.LBRACK, JavaLexer.RBRACK}
+
+
+class MethodSpan(NamedTuple):
+    name: str
+    name_token: Token
+    body_start: Token
+    body_stop: Token
+    # names of the enclosing named classes, outermost first
+    classes: tuple = ()
+    parameters: tuple = ()
+
+    @property
+    def key(self) -> str:
+        """qualified key of the method, see `method_keys`"""
+        return method_key(self.classes, self.name, parameter_types(list(self.parameters)))
+
+    @property
+    def start(self) -> int:
+        """character offset of the method name"""
+        return self.name_token.start
+
+    @property
+    def stop(self) -> int:
+        """character offset of the closing brace of the method body"""
+        return self.body_stop.stop
+
+    @property
+    def line(self) -> int:
+        return self.name_token.line
+
+
+def default_channel_tokens(token_stream: CommonTokenStream) -> List[Token]:
+    token_stream.fill()
+    return [token for token in token_stream.tokens
+            if token.channel == Token.DEFAULT_CHANNEL and token.type != Token.EOF]
+
+
+def find_method_spans(token_stream: CommonTokenStream) -> List[MethodSpan]:
+    """
+    Locates method declarations with a body by scanning the token stream only, without parsing.
+
+    :param token_stream: token stream of a whole compilation unit.
+    :return: the method spans in the order of their appearance.
+    """
+    return find_method_spans_in(default_channel_tokens(token_stream))
+
+
+def is_anonymous_class_body(tokens: List[Token], open_paren: int) -> bool:
+    """whether the arguments starting at `open_paren` belong to a `new T(...)` followed by a class body"""
+    i = open_paren - 1
+    while i >= 0 and tokens[i].type in INSTANTIATED_TYPE_TOKENS:
+        i -= 1
+    return i >= 0 and i < open_paren - 1 and tokens[i].type == JavaLexer.NEW
+
+
+def is_annotation_name(tokens: List[Token], end: int) -> bool:
+    """whether the qualified name ending at `end` names an annotation, e.g., `@Inject` or `@javax.inject.Inject`"""
+    i = end
+    while i >= 2 and tokens[i - 1].type == JavaLexer.DOT and tokens[i - 2].type == JavaLexer.Identifier:
+        i -= 2
+    return i > 0 and tokens[i - 1].type == JavaLexer.AT
+
+
+def find_method_spans_in(tokens: List[Token]) -> List[MethodSpan]:
+    """
+    Locates the method declarations of the classes declared in `tokens` (default channel tokens only).
+    Like `CFGExtractorVisitor`, constructors, initializer blocks and interface methods are not reported,
+    while the methods of anonymous classes and of the class bodies of enum constants are, as methods of
+    the enclosing named class. Methods of classes declared inside method bodies are not reported either;
+    they are found when the enclosing method body is extracted.
+    """
+    spans = []
+    scopes = []
+    # the depths of the enum scopes whose constants are being declared, i.e., before their first `;`
+    enum_constants = []
+    open_parens = []
+    last_open_paren = None
+    pending_type = pending_name = None
+    candidate = None
+    parameters = ()
+    header_closed = False
+
+    for i, token in enumerate(tokens):
+        kind = token.type
+        in_class = not scopes or scopes[-1][0] == CLASS
+        at_member_level = in_class and not open_parens
+
+        if kind == JavaLexer.LPAREN:
+            if (at_member_level and candidate is None and i > 1 and tokens[i - 1].type == JavaLexer.Identifier
+                    and tokens[i - 2].type in RESULT_TYPE_ENDINGS and not is_annotation_name(tokens, i - 2)):
+                candidate = tokens[i - 1]
+            open_parens.append(i)
+
+        elif kind == JavaLexer.RPAREN:
+            last_open_paren = open_parens.pop() if open_parens else None
+            if candidate is not None and not open_parens and not header_closed:
+                header_closed = True
+                parameters = tuple(tokens[last_open_paren + 1:i])
+
+        elif kind == JavaLexer.LBRACE:
+            # parentheses are tracked per brace scope, e.g., for class bodies inside method arguments
+            # the last item of a scope is the name of a named class or the parameter tokens of a method
+            if at_member_level and pending_type is not None:
+                scopes.append((CLASS, pending_type not in INTERFACE_KEYWORDS, token, open_parens, pending_name))
+                if pending_type == JavaLexer.ENUM:
+                    enum_constants.append(len(scopes))
+            elif at_member_level and enum_constants and enum_constants[-1] == len(scopes):
+                # the class body of an enum constant, e.g., `A { ... }` or `A(1) { ... }`
+                scopes.append((CLASS, True, token, open_parens, None))
+            elif at_member_level and header_closed:
+                scopes.append((METHOD, candidate if not scopes or scopes[-1][1] else None, token, open_parens,
+                               parameters))
+            elif (in_class and tokens[i - 1].type == JavaLexer.RPAREN and last_open_paren is not None
+                  and is_anonymous_class_body(tokens, last_open_paren)):
+                scopes.append((CLASS, True, token, open_parens, None))
+            else:
+                scopes.append((BLOCK, None, token, open_parens, None))
+            open_parens = []
+            pending_type, pending_name, candidate, header_closed = None, None, None, False
+
+        elif kind == JavaLexer.RBRACE:
+            if enum_constants and enum_constants[-1] == len(scopes):
+                enum_constants.pop()
+            if scopes:
+                scope, name_token, body_start, open_parens, detail = scopes.pop()
+                if scope == METHOD and name_token is not None:
+                    classes = tuple(outer[-1] for outer in scopes if outer[0] == CLASS and outer[-1] is not None)
+                    spans.append(MethodSpan(name_token.text, name_token, body_start, token, classes, detail))
+            pending_type, pending_name, candidate, header_closed = None, None, None, False
+
+        elif not at_member_level:
+            continue
+
+        elif kind in TYPE_KEYWORDS and (i == 0 or tokens[i - 1].type != JavaLexer.DOT):
+            pending_type = JavaLexer.AT if i > 0 and tokens[i - 1].type == JavaLexer.AT else kind
+
+        elif pending_type is not None and pending_name is None and kind == JavaLexer.Identifier:
+            pending_name = token.text
+
+        elif kind == JavaLexer.SEMI:
+            if enum_constants and enum_constants[-1] == len(scopes):
+                enum_constants.pop()
+            pending_type, pending_name, candidate, header_closed = None, None, None, False
+
+        elif header_closed and kind not in HEADER_TRAILERS:
+            candidate, header_closed = None, False
+
+    return sorted(spans, key=lambda span: span.start)
@@ -0,0 +1,237 @@
+"""
+Metrics-only extraction: visits the methods like the CFG extractors do, but counts their decisions, loops, exit
+statements and nesting instead of building their CFGs, so that no graph is built, merged, resolved or relabeled.
+
+The counts follow the statements the CFG extractors handle: a decision is an if statement, a loop with a condition,
+a non-default case label of a switch statement group or a catch clause. Enhanced for loops, which the CFG extractors
+flatten into their body, are counted as loops as well. The exit statements are the return and throw statements, plus
+the end of a method that may complete normally.
+
+These are counted on the syntax, so they are kept in columns of their own in the corpus index, next to the
+cyclomatic complexity and the exits of `corpus_index.method_metrics`, which are counted on the CFG, whose
+unreachable statements are dropped and whose statements are merged into blocks. The syntactic complexity, the
+decisions plus one, stands in for the cyclomatic complexity when ranking the methods of a metrics-only run.
+
+The visits return `True` for the statements that end the method on every path, and `None` for the others.
+"""
+from typing import List
+
+from antlr4 import CommonTokenStream, Token
+
+from antlr.gen.JavaLexer import JavaLexer
+from antlr.gen.JavaParser import JavaParser
+from src.cfg_extractor.cfg_extractor_visitor import CFGExtractorVisitor
+from src.cfg_extractor.method_spans import default_channel_tokens
+from src.cfg_extractor.skeleton_parser import SkeletonParser
+from src.cfg_extractor.skeleton_visitor import SkeletonCFGVisitor
+from src.cfg_extractor.straight_line import body_tokens, straight_line_statements
+
+EXIT_TOKENS = {JavaLexer.RETURN, JavaLexer.THROW}
+
+
+class MethodMetrics:
+    """Counts of one method, updated while it is visited."""
+    __slots__ = ("decisions", "loops", "exit_statements", "nesting_depth")
+
+    def __init__(self):
+        self.decisions = self.loops = self.exit_statements = self.nesting_depth = 0
+
+    def as_dict(self) -> dict:
+        """the metrics for `CorpusIndex.add_file`, which leaves the ones counted on the CFG as they are"""
+        return {"nesting_depth": self.nesting_depth, "decisions": self.decisions,
+                "syntactic_complexity": self.decisions + 1, "loops": self.loops,
+                "exit_statements": self.exit_statements}
+
+
+class MetricsVisitor(CFGExtractorVisitor):
+    """
+    Visits a parse tree like `CFGExtractorVisitor`, keeping a `MethodMetrics` per method in `functions`
+    in place of its CFG. Expressions are not visited.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.metrics = None
+
+    def extract_function(self, name: str, body: JavaParser.MethodBodyContext):
+        outer = self.metrics, self.nesting, self.max_nesting
+        self.metrics, self.nesting, self.max_nesting = MethodMetrics(), 0, 0
+        tokens = body_tokens(body.parser.getTokenStream().tokens, body.start.tokenIndex, body.stop.tokenIndex)
+        statements = straight_line_statements(tokens)
+        if statements is not None:
+            self.metrics.exit_statements = 1 if statements else 0
+        else:
+            if not self.visit(body):
+                self.metrics.exit_statements += 1
+            self.metrics.nesting_depth = self.max_nesting
+        self.functions[name] = self.metrics
+        self.metrics, self.nesting, self.max_nesting = outer
+
+    def visitBlockStatements(self, ctx: JavaParser.BlockStatementsContext):
+        # the statements after one that ends the method are dead code, which is still counted
+        return any([self.visit(block) for block in ctx.blockStatement()]) or None
+
+    def visit_decision(self, *parts, loop=False, decision=True):
+        """
+        :param decision: whether the statement branches, which loops without a condition, `for (;;)`, do not.
+        :return: whether each part ends the method
+        """
+        self.metrics.decisions += decision
+        self.metrics.loops += loop
+        return [self.visit_nested(part) for part in parts]
+
+    def visitIfThenStatement(self, ctx: JavaParser.IfThenStatementContext):
+        self.visit_decision(ctx.statement())
+
+    def visitIfThenElseStatement(self, ctx: JavaParser.IfThenElseStatementContext):
+        return all([*self.visit_decision(ctx.statementNoShortIf()), self.visit_else(ctx.statement())]) or None
+
+    def visitIfThenElseStatementNoShortIf(self, ctx: JavaParser.IfThenElseStatementNoShortIfContext):
+        then_part, else_part = ctx.statementNoShortIf()
+        return all([*self.visit_decision(then_part), self.visit_else(else_part)]) or None
+
+    def visitWhileStatement(self, ctx: JavaParser.WhileStatementContext):
+        self.visit_decision(ctx.statement(), loop=True)
+
+    def visitWhileStatementNoShortIf(self, ctx: JavaParser.WhileStatementNoShortIfContext):
+        self.visit_decision(ctx.statementNoShortIf(), loop=True)
+
+    def visitDoStatement(self, ctx: JavaParser.DoStatementContext):
+        self.visit_decision(ctx.statement(), loop=True)
+
+    def visitBasicForStatement(self, ctx: JavaParser.BasicForStatementContext):
+        self.visit_decision(ctx.statement(), loop=True, decision=ctx.expression() is not None)
+
+    def visitBasicForStatementNoShortIf(self, ctx: JavaParser.BasicForStatementNoShortIfContext):
+        self.visit_decision(ctx.statementNoShortIf(), loop=True, decision=ctx.expression() is not None)
+
+    def visitEnhancedForStatement(self, ctx: JavaParser.EnhancedForStatementContext):
+        self.visit_decision(ctx.statement(), loop=True)
+
+    def visitEnhancedForStatementNoShortIf(self, ctx: JavaParser.EnhancedForStatementNoShortIfContext):
+        self.visit_decision(ctx.statementNoShortIf(), loop=True)
+
+    def visitSwitchStatement(self, ctx: JavaParser.SwitchStatementContext):
+        self.visit(ctx.switchBlock())
+
+    def visitSwitchBlock(self, ctx: JavaParser.SwitchBlockContext):
+        for switch_group in ctx.switchBlockStatementGroup():
+            self.visit_nested(switch_group)
+
+    def visitSwitchBlockStatementGroup(self, ctx: JavaParser.SwitchBlockStatementGroupContext):
+        self.metrics.decisions += sum(1 for label in ctx.switchLabel() if label.start.type == JavaLexer.CASE)
+        self.visit(ctx.blockStatements())
+
+    def visitTryStatement(self, ctx: JavaParser.TryStatementContext):
+        # like `SkeletonParser`, try-with-resources contributes its catch clauses only
+        ends = ctx.block() is not None and self.visit_nested(ctx.block())
+        catches = (ctx.tryWithResourcesStatement() or ctx).catches()
+        for catch in catches.catchClause() if catches is not None else []:
+            ends = all(self.visit_decision(catch.block())) and ends
+        return ends or None
+
+    def visitReturnStatement(self, ctx: JavaParser.ReturnStatementContext):
+        self.metrics.exit_statements += 1
+        return True
+
+    def visitThrowStatement(self, ctx: JavaParser.ThrowStatementContext):
+        self.metrics.exit_statements += 1
+        return True
+
+    def visitExpressionStatement(self, ctx: JavaParser.ExpressionStatementContext):
+        pass
+
+    def visitLocalVariableDeclarationStatement(self, ctx: JavaParser.LocalVariableDeclarationStatementContext):
+        pass
+
+    def visitBreakStatement(self, ctx: JavaParser.BreakStatementContext):
+        pass
+
+    def visitContinueStatement(self, ctx: JavaParser.ContinueStatementContext):
+        pass
+
+    def visitEmptyStatement_(self, ctx: JavaParser.EmptyStatement_Context):
+        pass
+
+
+class SkeletonMetricsVisitor(SkeletonCFGVisitor):
+    """Counts the metrics of the methods of the statement skeleton, like `MetricsVisitor` does on parse trees."""
+
+    def __init__(self):
+        super().__init__()
+        self.metrics = None
+
+    def extract_function(self, name: str, body: List[Token], classes=()):
+        outer = self.metrics, self.classes, self.nesting, self.max_nesting
+        self.metrics, self.classes, self.nesting, self.max_nesting = MethodMetrics(), classes, 0, 0
+        statements = straight_line_statements(body)
+        if statements is not None:
+            self.metrics.exit_statements = 1 if statements else 0
+        else:
+            if not self.visit(SkeletonParser(body).method_body()):
+                self.metrics.exit_statements += 1
+            self.metrics.nesting_depth = self.max_nesting
+        self.functions[name] = self.metrics
+        self.metrics, self.classes, self.nesting, self.max_nesting = outer
+
+    def visitBlockStatements(self, statements):
+        return any([self.visit(statement) for statement in statements]) or None
+
+    def visit_decision(self, *parts, loop=False, decision=True):
+        """
+        :param decision: whether the statement branches, which loops without a condition, `for (;;)`, do not.
+        :return: whether each part ends the method
+        """
+        self.metrics.decisions += decision
+        self.metrics.loops += loop
+        return [self.visit_nested(part) for part in parts]
+
+    def visitStatement(self, node):
+        if node.span.start.type in EXIT_TOKENS:
+            self.metrics.exit_statements += 1
+            return True
+
+    def visitEnhancedForStatement(self, node):
+        self.visit_decision(node.body, loop=True)
+
+    def visitIfThenStatement(self, node):
+        self.visit_decision(node.then_part)
+
+    def visitIfThenElseStatement(self, node):
+        return all([*self.visit_decision(node.then_part), self.visit_else(node.else_part)]) or None
+
+    def visitSwitchStatement(self, node):
+        for group in node.groups:
+            self.visit_nested(group)
+
+    def visitSwitchBlockStatementGroup(self, node):
+        self.metrics.decisions += sum(1 for label in node.labels if label.start.type == JavaLexer.CASE)
+        self.visitBlockStatements(node.statements)
+
+    def visitBasicForStatement(self, node):
+        self.visit_decision(node.body, loop=True, decision=node.condition is not None)
+
+    def visitWhileStatement(self, node):
+        self.visit_decision(node.body, loop=True)
+
+    def visitDoStatement(self, node):
+        self.visit_decision(node.body, loop=True)
+
+    def visitTryStatement(self, node):
+        ends = node.block is not None and self.visit_nested(node.block)
+        for catch in node.catches or []:
+            ends = all(self.visit_decision(catch.block)) and ends
+        return ends or None
+
+
+def extract_skeleton_metrics(stream):
+    """
+    Counts the metrics of the methods of a compilation unit with the skeleton frontend.
+
+    :return: a dictionary from the key of each method to its `MethodMetrics`.
+    """
+    lexer = JavaLexer(stream)
+    token_stream = CommonTokenStream(lexer)
+    visitor = SkeletonMetricsVisitor()
+    visitor.visitCompilationUnit(default_channel_tokens(token_stream))
+    return visitor.functions
@@ -0,0 +1,324 @@
+from typing import List, NamedTuple, Optional
+
+from antlr4 import Token
+
+from antlr.gen.JavaLexer import JavaLexer
+from src.antlr.rule_utils import skip_annotation
+from src.antlr.token_span import TokenSpan
+
+OPENING = {JavaLexer.LPAREN, JavaLexer.LBRACK, JavaLexer.LBRACE}
+CLOSING = {JavaLexer.RPAREN, JavaLexer.RBRACK, JavaLexer.RBRACE}
+
+LOCAL_TYPE_MODIFIERS = {JavaLexer.FINAL, JavaLexer.ABSTRACT, JavaLexer.STATIC, JavaLexer.STRICTFP}
+LOCAL_TYPE_KEYWORDS = {JavaLexer.CLASS, JavaLexer.INTERFACE, JavaLexer.ENUM, JavaLexer.RECORD}
+
+# Statement-level syntax tree of a method body.
+# Expressions are never parsed; they are kept as the `TokenSpan` of their tokens.
+# Each node corresponds to the parser rule of the same name in `JavaParser.g4`.
+
+
+class Block(NamedTuple):
+    statements: List
+
+
+class Statement(NamedTuple):
+    """expression, local variable declaration, break, continue, return, throw or empty statements"""
+    span: TokenSpan
+
+
+class OpaqueStatement(NamedTuple):
+    """assert and yield statements, which contribute no block to the CFG"""
+    span: TokenSpan
+
+
+class LabeledStatement(NamedTuple):
+    statement: object
+
+
+class IfThenStatement(NamedTuple):
+    condition: TokenSpan
+    then_part: object
+
+
+class IfThenElseStatement(NamedTuple):
+    condition: TokenSpan
+    then_part: object
+    else_part: object
+
+
+class WhileStatement(NamedTuple):
+    condition: TokenSpan
+    body: object
+
+
+class DoStatement(NamedTuple):
+    body: object
+    condition: TokenSpan
+
+
+class BasicForStatement(NamedTuple):
+    initializer: Optional[TokenSpan]
+    condition: Optional[TokenSpan]
+    successor: Optional[TokenSpan]
+    body: object
+
+
+class EnhancedForStatement(NamedTuple):
+    body: object
+
+
+class SwitchStatement(NamedTuple):
+    switcher: TokenSpan
+    groups: List
+
+
+class SwitchBlockStatementGroup(NamedTuple):
+    labels: List[TokenSpan]
+    statements: List
+
+
+class TryStatement(NamedTuple):
+    block: Optional[Block]
+    catches: Optional[List]
+
+
+class CatchClause(NamedTuple):
+    parameter: TokenSpan
+    block: Block
+
+
+class SynchronizedStatement(NamedTuple):
+    block: Block
+
+
+class LocalClassDeclaration(NamedTuple):
+    tokens: List[Token]
+
+
+class SkeletonSyntaxError(Exception):
+    pass
+
+
+class SkeletonParser:
+    """
+    A hand-written recursive descent parser of the statement structure of Java method bodies.
+    It works on the default channel tokens of `JavaLexer` and only tracks bracket nesting
+    inside expressions, so its cost is linear in the number of tokens.
+    """
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, offset=0) -> int:
+        i = self.pos + offset
+        return self.tokens[i].type if i < len(self.tokens) else Token.EOF
+
+    def expect(self, kind) -> Token:
+        if self.peek() != kind:
+            found = self.tokens[self.pos] if self.pos < len(self.tokens) else None
+            raise SkeletonSyntaxError(f"expected {JavaLexer.symbolicNames[kind]} at line "
+                                      f"{found.line if found else 'EOF'}, found {found.text if found else 'EOF'!r}")
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def span(self, start, stop) -> Optional[TokenSpan]:
+        return TokenSpan(self.tokens[start:stop]) if start < stop else None
+
+    def skip_balanced(self, until) -> int:
+        """advances to the first `until` token outside brackets and returns its index"""
+        depth = 0
+        while self.pos < len(self.tokens):
+            kind = self.peek()
+            if not depth and kind in until:
+                return self.pos
+            if kind in OPENING:
+                depth += 1
+            elif kind in CLOSING:
+                depth -= 1
+            self.pos += 1
+        raise SkeletonSyntaxError(f"unbalanced brackets in {self.tokens[0].text!r}...")
+
+    def parenthesized(self) -> Optional[TokenSpan]:
+        self.expect(JavaLexer.LPAREN)
+        start = self.pos
+        stop = self.skip_balanced({JavaLexer.RPAREN})
+        self.pos += 1
+        return self.span(start, stop)
+
+    def until_semicolon(self) -> TokenSpan:
+        start = self.pos
+        self.skip_balanced({JavaLexer.SEMI})
+        self.pos += 1
+        return self.span(start, self.pos)
+
+    def method_body(self):
+        if self.peek() == JavaLexer.SEMI:
+            self.pos += 1
+            return None
+        return self.block()
+
+    def block(self) -> Block:
+        self.expect(JavaLexer.LBRACE)
+        statements = []
+        while self.peek() != JavaLexer.RBRACE:
+            statements.append(self.block_statement())
+        self.expect(JavaLexer.RBRACE)
+        return Block(statements)
+
+    def block_statement(self):
+        if self.is_local_class_declaration():
+            return self.local_class_declaration()
+        return self.statement()
+
+    def is_local_class_declaration(self) -> bool:
+        i = self.pos
+        while i < len(self.tokens):
+            kind = self.tokens[i].type
+            if kind in LOCAL_TYPE_MODIFIERS:
+                i += 1
+            elif kind == JavaLexer.AT and i + 1 < len(self.tokens) and self.tokens[i + 1].type != JavaLexer.INTERFACE:
+                i = skip_annotation(self.tokens, i)
+            else:
+                break
+        i -= self.pos
+        if self.peek(i) == JavaLexer.AT:
+            i += 1
+        return self.peek(i) in LOCAL_TYPE_KEYWORDS and self.peek(i + 1) == JavaLexer.Identifier
+
+    def local_class_declaration(self) -> LocalClassDeclaration:
+        start = self.pos
+        self.skip_balanced({JavaLexer.LBRACE})
+        self.block_tokens()
+        return LocalClassDeclaration(self.tokens[start:self.pos])
+
+    def block_tokens(self):
+        self.expect(JavaLexer.LBRACE)
+        self.skip_balanced({JavaLexer.RBRACE})
+        self.pos += 1
+
+    def statement(self):
+        kind = self.peek()
+        if kind == JavaLexer.LBRACE:
+            return self.block()
+        if kind == JavaLexer.IF:
+            return self.if_statement()
+        if kind == JavaLexer.WHILE:
+            self.pos += 1
+            return WhileStatement(self.parenthesized(), self.statement())
+        if kind == JavaLexer.DO:
+            self.pos += 1
+            body = self.statement()
+            self.expect(JavaLexer.WHILE)
+            condition = self.parenthesized()
+            self.expect(JavaLexer.SEMI)
+            return DoStatement(body, condition)
+        if kind == JavaLexer.FOR:
+            return self.for_statement()
+        if kind == JavaLexer.SWITCH:
+            return self.switch_statement()
+        if kind == JavaLexer.TRY:
+            return self.try_statement()
+        if kind == JavaLexer.SYNCHRONIZED:
+            self.pos += 1
+            self.parenthesized()
+            return SynchronizedStatement(self.block())
+        if kind == JavaLexer.Identifier and self.peek(1) == JavaLexer.COLON:
+            self.pos += 2
+            return LabeledStatement(self.statement())
+        if kind == JavaLexer.ASSERT or (kind == JavaLexer.YIELD and self.peek(1) != JavaLexer.ASSIGN):
+            return OpaqueStatement(self.until_semicolon())
+        return Statement(self.until_semicolon())
+
+    def if_statement(self):
+        self.expect(JavaLexer.IF)
+        condition = self.parenthesized()
+        then_part = self.statement()
+        if self.peek() == JavaLexer.ELSE:
+            self.pos += 1
+            return IfThenElseStatement(condition, then_part, self.statement())
+        return IfThenStatement(condition, then_part)
+
+    def for_statement(self):
+        self.expect(JavaLexer.FOR)
+        self.expect(JavaLexer.LPAREN)
+        start = self.pos
+        stop = self.skip_balanced({JavaLexer.RPAREN})
+        self.pos = start
+        separators = []
+        while self.skip_balanced({JavaLexer.SEMI, JavaLexer.RPAREN}) < stop:
+            separators.append(self.pos)
+            self.pos += 1
+        self.pos = stop + 1
+        if not separators:
+            return EnhancedForStatement(self.statement())
+
+        first, second = separators
+        return BasicForStatement(self.span(start, first), self.span(first + 1, second),
+                                 self.span(second + 1, stop), self.statement())
+
+    def switch_statement(self):
+        self.expect(JavaLexer.SWITCH)
+        switcher = self.parenthesized()
+        self.expect(JavaLexer.LBRACE)
+        groups = []
+        while self.peek() != JavaLexer.RBRACE:
+            labels = []
+            while self.peek() in (JavaLexer.CASE, JavaLexer.DEFAULT):
+                labels.append(self.switch_label())
+                if self.peek() == JavaLexer.ARROW:
+                    # switch rules have no statement groups
+                    self.pos += 1
+                    if self.peek() == JavaLexer.LBRACE:
+                        self.block_tokens()
+                    else:
+                        self.until_semicolon()
+                    labels = []
+                    continue
+                self.expect(JavaLexer.COLON)
+            statements = []
+            while self.peek() not in (JavaLexer.CASE, JavaLexer.DEFAULT, JavaLexer.RBRACE):
+                statements.append(self.block_statement())
+            if statements:
+                groups.append(SwitchBlockStatementGroup(labels, statements))
+        self.expect(JavaLexer.RBRACE)
+        return SwitchStatement(switcher, groups)
+
+    def switch_label(self) -> TokenSpan:
+        start = self.pos
+        self.pos += 1
+        depth, conditionals = 0, 0
+        while self.pos < len(self.tokens):
+            kind = self.peek()
+            if not depth and kind == JavaLexer.ARROW:
+                break
+            if not depth and kind == JavaLexer.COLON:
+                if not conditionals:
+                    break
+                conditionals -= 1
+            elif kind == JavaLexer.QUESTION:
+                conditionals += 1
+            elif kind in OPENING:
+                depth += 1
+            elif kind in CLOSING:
+                depth -= 1
+            self.pos += 1
+        return self.span(start, self.pos)
+
+    def try_statement(self):
+        self.expect(JavaLexer.TRY)
+        if self.peek() == JavaLexer.LPAREN:
+            # try-with-resources has no plain try block
+            self.parenthesized()
+            self.block_tokens()
+            block = None
+        else:
+            block = self.block()
+        catches = []
+        while self.peek() == JavaLexer.CATCH:
+            self.pos += 1
+            catches.append(CatchClause(self.parenthesized(), self.block()))
+        if self.peek() == JavaLexer.FINALLY:
+            self.pos += 1
+            self.block()
+        return TryStatement(block, catches or None)
@@ -0,0 +1,148 @@
+from typing import List
+
+from antlr4 import CommonTokenStream, Token
+
+from antlr.gen.JavaLexer import JavaLexer
+from src.cfg_extractor.language_structure.digraph_embedder import DiGraphEmbedder
+from src.cfg_extractor.method_keys import method_key, parameter_types
+from src.cfg_extractor.method_spans import default_channel_tokens, find_method_spans_in
+from src.cfg_extractor.skeleton_parser import IfThenElseStatement, IfThenStatement, SkeletonParser
+from src.cfg_extractor.straight_line import straight_line_statements, straight_line_cfg
+from src.data_structures.graph.networkx_builder import NxDiGraphBuilder as DiGraphBuilder
+from src import profiling
+
+
+class SkeletonCFGVisitor:
+    """
+    Drives the `DiGraphEmbedder` patterns from the statement skeleton built by `SkeletonParser`.
+    Each method mirrors its counterpart in `CFGExtractorVisitor`, with token spans in place of
+    parse tree contexts, so that both frontends yield the same CFGs.
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self.functionLastNode = {}
+        self.catches = []
+        # names of the classes enclosing the method being extracted, outermost first
+        self.classes = ()
+        self.nesting = self.max_nesting = 0
+
+    def visit(self, node):
+        if node is None:
+            return None
+        return getattr(self, "visit" + type(node).__name__)(node)
+
+    def visitCompilationUnit(self, tokens: List[Token]):
+        positions = {token.tokenIndex: i for i, token in enumerate(tokens)}
+        for span in find_method_spans_in(tokens):
+            body = tokens[positions[span.body_start.tokenIndex]:positions[span.body_stop.tokenIndex] + 1]
+            # the classes of local classes are qualified by the classes of their enclosing method
+            classes = (*self.classes, *span.classes)
+            name = method_key(classes, span.name, parameter_types(list(span.parameters)))
+            with profiling.unit(name):
+                self.extract_function(name, body, classes)
+
+    def extract_function(self, name: str, body: List[Token], classes=()):
+        copies = DiGraphBuilder.copies
+        outer = self.classes, self.nesting, self.max_nesting
+        self.classes, self.nesting, self.max_nesting = classes, 0, 0
+        statements = straight_line_statements(body)
+        if statements is not None:
+            graph, self.functionLastNode[name] = straight_line_cfg(statements)
+        else:
+            gin = self.visit(SkeletonParser(body).method_body())
+            graph, self.functionLastNode[name] = DiGraphEmbedder.embed_in_function(gin, self.catches)
+            self.catches = []
+        self.functions[name] = graph.build()
+        self.functions[name].graph["nesting_depth"] = self.max_nesting
+        self.functions[name].graph["graph_copies"] = DiGraphBuilder.copies - copies
+        self.classes, self.nesting, self.max_nesting = outer
+
+    def visit_nested(self, node):
+        self.nesting += 1
+        self.max_nesting = max(self.max_nesting, self.nesting)
+        graph = self.visit(node)
+        self.nesting -= 1
+        return graph
+
+    def visit_else(self, node):
+        if isinstance(node, (IfThenStatement, IfThenElseStatement)):
+            return self.visit(node)
+        return self.visit_nested(node)
+
+    def visitLocalClassDeclaration(self, node):
+        self.visitCompilationUnit(node.tokens)
+
+    def visitBlock(self, node):
+        if node.statements:
+            return self.visitBlockStatements(node.statements)
+
+    def visitBlockStatements(self, statements):
+        gins = (self.visit(statement) for statement in statements)
+        return DiGraphEmbedder.merge_sequence(gins)
+
+    def visitStatement(self, node):
+        return DiGraphBuilder().add_node(value=[node.span])
+
+    def visitOpaqueStatement(self, node):
+        return None
+
+    def visitLabeledStatement(self, node):
+        return self.visit(node.statement)
+
+    def visitSynchronizedStatement(self, node):
+        return self.visit(node.block)
+
+    def visitEnhancedForStatement(self, node):
+        return self.visit(node.body)
+
+    def visitIfThenStatement(self, node):
+        then_part_graph = self.visit_nested(node.then_part)
+        return DiGraphEmbedder.embed_in_if(node.condition, then_part_graph)
+
+    def visitIfThenElseStatement(self, node):
+        then_part_graph = self.visit_nested(node.then_part)
+        else_part_graph = self.visit_else(node.else_part)
+        return DiGraphEmbedder.embed_in_if_else(node.condition, then_part_graph, else_part_graph)
+
+    def visitSwitchStatement(self, node):
+        case_labels, case_bodies = zip(*[self.visit_nested(group) for group in node.groups])
+        return DiGraphEmbedder.embed_in_switch_case(node.switcher, case_labels, case_bodies)
+
+    def visitSwitchBlockStatementGroup(self, node):
+        return node.labels, self.visitBlockStatements(node.statements)
+
+    def visitBasicForStatement(self, node):
+        body_graph = self.visit_nested(node.body)
+        return DiGraphEmbedder.embed_in_for(node.condition, node.initializer, node.successor, body_graph)
+
+    def visitWhileStatement(self, node):
+        body_graph = self.visit_nested(node.body)
+        return DiGraphEmbedder.embed_in_while(node.condition, body_graph)
+
+    def visitDoStatement(self, node):
+        do_body_graph = self.visit_nested(node.body)
+        return DiGraphEmbedder.embed_in_do_while(node.condition, do_body_graph)
+
+    def visitTryStatement(self, node):
+        try_body = self.visit_nested(node.block)
+        catch_exceptions, catch_bodies = zip(*[self.visit(catch) for catch in node.catches])
+        embeded_graph, self.catches = DiGraphEmbedder.embed_in_try_catch(try_body, catch_exceptions, catch_bodies)
+        return embeded_graph
+
+    def visitCatchClause(self, node):
+        catch_body = self.visit_nested(node.block)
+        return node.parameter, catch_body
+
+
+def extract_skeleton(stream):
+    """
+    Extracts the CFGs of a compilation unit with the skeleton frontend, which needs the lexer only.
+
+    :return: the same triple as `extract`.
+    """
+    lexer = JavaLexer(stream)
+    token_stream = CommonTokenStream(lexer)
+    cfg_extractor = SkeletonCFGVisitor()
+    cfg_extractor.visitCompilationUnit(default_channel_tokens(token_stream))
+    return cfg_extractor.functions, token_stream, cfg_extractor.functionLastNode
@@ -0,0 +1,76 @@
+from typing import List, Optional, Tuple
+
+from antlr4 import Token
+
+from antlr.gen.JavaLexer import JavaLexer
+from src.antlr.token_span import TokenSpan
+from src.data_structures.graph.networkx_builder import NxDiGraphBuilder as DiGraphBuilder
+
+# tokens that introduce a branch, a jump, a nested block or a statement without a visitor
+NON_STRAIGHT_TOKENS = {JavaLexer.IF, JavaLexer.ELSE, JavaLexer.FOR, JavaLexer.WHILE, JavaLexer.DO,
+                       JavaLexer.SWITCH, JavaLexer.CASE, JavaLexer.DEFAULT, JavaLexer.YIELD,
+                       JavaLexer.TRY, JavaLexer.CATCH, JavaLexer.FINALLY, JavaLexer.THROW,
+                       JavaLexer.BREAK, JavaLexer.CONTINUE, JavaLexer.SYNCHRONIZED, JavaLexer.ASSERT,
+                       JavaLexer.INTERFACE, JavaLexer.ENUM, JavaLexer.RECORD,
+                       JavaLexer.LBRACE, JavaLexer.RBRACE, JavaLexer.ARROW}
+
+
+def body_tokens(tokens: List[Token], start: int, stop: int) -> List[Token]:
+    """default channel tokens between the token indexes `start` and `stop` (inclusive)"""
+    return [token for token in tokens[start:stop + 1] if token.channel == Token.DEFAULT_CHANNEL]
+
+
+def is_labeled(statement: List[Token]) -> bool:
+    return (len(statement) > 1 and statement[0].type == JavaLexer.Identifier
+            and statement[1].type == JavaLexer.COLON)
+
+
+def straight_line_statements(tokens: List[Token]) -> Optional[List[TokenSpan]]:
+    """
+    Splits a method body into statements if it has no control flow, i.e., it consists of simple statements
+    and at most one `return`, which is the last statement.
+
+    :param tokens: default channel tokens of a method body, including its braces.
+    :return: the statements as token spans, or None if the body is not straight-line.
+    """
+    if len(tokens) == 1 and tokens[0].type == JavaLexer.SEMI:
+        return []
+    if len(tokens) < 2 or tokens[0].type != JavaLexer.LBRACE or tokens[-1].type != JavaLexer.RBRACE:
+        return None
+
+    statements, current, depth = [], [], 0
+    for i in range(1, len(tokens) - 1):
+        token = tokens[i]
+        if token.type in NON_STRAIGHT_TOKENS:
+            return None
+        if token.type == JavaLexer.CLASS and tokens[i - 1].type != JavaLexer.DOT:
+            return None
+        if token.type == JavaLexer.RETURN and current:
+            return None
+
+        current.append(token)
+        if token.type in (JavaLexer.LPAREN, JavaLexer.LBRACK):
+            depth += 1
+        elif token.type in (JavaLexer.RPAREN, JavaLexer.RBRACK):
+            depth -= 1
+        elif token.type == JavaLexer.SEMI and depth == 0:
+            if is_labeled(current):
+                return None
+            statements.append(TokenSpan(current))
+            current = []
+
+    if current or any(statement.start.type == JavaLexer.RETURN for statement in statements[:-1]):
+        return None
+    return statements
+
+
+def straight_line_cfg(statements: List[TokenSpan]) -> Tuple[DiGraphBuilder, List]:
+    """
+    Builds the single block CFG of a straight-line method body along with its end nodes,
+    exactly as `DiGraphEmbedder.embed_in_function` does for such a body.
+    """
+    if not statements:
+        return DiGraphBuilder(), []
+    graph = DiGraphBuilder().add_node(0, statements)
+    end_nodes = [(0, None)] if statements[-1].start.type == JavaLexer.RETURN else []
+    return graph, end_nodes
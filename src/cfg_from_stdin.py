@@ -1,25 +1,29 @@
-from antlr4 import CommonTokenStream, StdinStream, FileStream
+import argparse
+import signal
+import sys
+
+from antlr4 import CommonTokenStream
 from antlr.gen.JavaLexer import JavaLexer
 from antlr.gen.JavaParser import JavaParser
+from src.antlr.input_sources import input_stream, java_source_texts, output_name
 from src.cfg_extractor.cfg_extractor_visitor import CFGExtractorVisitor
+from src.cfg_extractor.incremental import IncrementalExtractor, content_hash
+from src.cfg_extractor.metrics_visitor import MetricsVisitor, extract_skeleton_metrics
+from src.cfg_extractor.skeleton_visitor import extract_skeleton
+from src.cfg_pipeline import report_stages, run_pipeline
+from src.cfg_extractor.method_keys import path_name
+from src.code_coverage.coverage_stage import CRITERIA, make_task, run_coverage
+from src.corpus_index import CorpusIndex, method_metrics
+from src.graph.sinks import SINKS, SINK_SUFFIXES
 from src.graph.visual import draw_CFG
+from src.manifest import Manifest
+from src import profiling
 import os
-from networkx import to_dict_of_dicts
 from pathlib import Path
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
-def find_java_files(directory):
-    """
-    Recursively finds Java files in the given directory and yields project number and Java file number.
-
-    :param directory: Root directory to start searching from.
-    :yield: Tuples containing the project number and the Java file number within each project.
-    """
-    return [str(filename) for filename in Path(directory).rglob('*.java')]
-
-
 def prompt():
     project_name = input("Enter your Project Name[1_tulibee]: ")
     is_verbose = input("Verbose graph draw (y/n)? ").startswith(("y", "Y"))
@@ -42,26 +46,201 @@ def extract(stream):
     return funcs, token_stream, LastNodes
 
 
-def makedir(directory):
+def extract_metrics(stream):
+    lexer = JavaLexer(stream)
+    token_stream = CommonTokenStream(lexer)
+    parser = JavaParser(token_stream)
+    parse_tree = parser.compilationUnit()
+    metrics_visitor = MetricsVisitor()
+    metrics_visitor.visit(parse_tree)
+    return metrics_visitor.functions
+
+
+FRONTENDS = {"antlr": extract, "skeleton": extract_skeleton}
+METRICS_FRONTENDS = {"antlr": extract_metrics, "skeleton": extract_skeleton_metrics}
+
+
+def shard_spec(spec):
+    """parses `i/N`, the shard `i` out of `N` shards numbered from 0"""
+    try:
+        index, count = map(int, spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {spec!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index {index} is not in 0..{count - 1}")
+    return index, count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and draw the control flow graphs of a Java project.")
+    parser.add_argument("project_path", nargs="?",
+                        help="directory to search for Java files and zip/jar archives of them, or a single archive; "
+                             "asked interactively when omitted")
+    parser.add_argument("--name", dest="project_name", help="output folder name (default: project directory name)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="draw statement texts inside the blocks")
+    parser.add_argument("--incremental", metavar="STATE_DIR",
+                        help="only rebuild the methods changed since the previous run recorded in STATE_DIR")
+    parser.add_argument("--frontend", choices=sorted(FRONTENDS), default="antlr",
+                        help="'antlr' parses whole compilation units, 'skeleton' only parses the statement "
+                             "structure and keeps expressions as token ranges (default: %(default)s)")
+    parser.add_argument("--coverage", choices=sorted(CRITERIA),
+                        help="also compute the test requirements and test paths of every method with this criterion")
+    parser.add_argument("--coverage-timeout", type=float, default=10.0, metavar="SECONDS",
+                        help="time budget of the coverage of each method (default: %(default)s)")
+    parser.add_argument("--coverage-max-paths", type=int, default=10000, metavar="N",
+                        help="largest number of test requirements or test paths per method (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="number of coverage worker processes")
+    parser.add_argument("--sink", choices=sorted(SINKS),
+                        help="write all the outputs of the run into one tar, zip or pack file instead of a directory "
+                             "per file and method")
+    parser.add_argument("--sink-path", help="path of the sink file (default: test_output/<project name>.<suffix>)")
+    parser.add_argument("--compress-workers", type=int, default=None,
+                        help="number of threads compressing the entries of a pack sink")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap reading, parsing, rendering and writing in a pipeline of concurrent stages")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="number of processes parsing and building CFGs in the pipeline (default: CPU count)")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="number of concurrent dot processes in the pipeline (default: --parse-workers)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the files and coverage results the manifest of an interrupted run records as done")
+    parser.add_argument("--shard", type=shard_spec, metavar="i/N",
+                        help="only extract the files of shard i out of N (numbered from 0), chosen by a stable hash "
+                             "of their paths, for splitting a corpus over processes or machines; merge the pack "
+                             "sinks of the shards with `python -m src.merge_shards`")
+    parser.add_argument("--index", metavar="DB",
+                        help="store the metrics of every method in this SQLite index, see `python -m src.corpus_index`")
+    parser.add_argument("--index-prime-paths", action="store_true",
+                        help="also count the prime paths of every method in the index, which may take long")
+    parser.add_argument("--metrics-only", action="store_true",
+                        help="only count the decisions, loops, exit statements and nesting of every method into the "
+                             "--index, without building, drawing or writing any CFG")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="profile every file and method, and write the profile of the run, the profiles of the "
+                             "slowest files and methods and a report of their hottest functions to DIR "
+                             "(default: test_output/<project name>/profile)")
+    parser.add_argument("--profile-top", type=int, default=20, metavar="N",
+                        help="number of slowest files and methods whose profiles are kept (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.metrics_only:
+        if not args.index:
+            parser.error("--metrics-only needs an --index to store the metrics in")
+        for option in ("pipeline", "incremental", "coverage", "sink", "index_prime_paths"):
+            if getattr(args, option):
+                parser.error(f"--metrics-only can not be combined with --{option.replace('_', '-')}")
+    if args.pipeline and args.incremental:
+        parser.error("--pipeline can not be combined with --incremental")
+    if args.resume and args.sink and not SINKS[args.sink].resumable:
+        parser.error(f"--resume can not append to a {args.sink} sink, use a pack sink or a directory")
+    if args.compress_workers is not None and not (args.sink and SINKS[args.sink].parallel):
+        parser.error("--compress-workers only applies to a pack sink, tar and zip sinks are compressed in one stream")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.project_path is None:
+        is_verbose, project_path, project_name = prompt()
+    else:
+        is_verbose, project_path = args.verbose, args.project_path
+        project_name = args.project_name or Path(project_path).resolve().name
+
+    incremental = IncrementalExtractor(args.incremental) if args.incremental else None
+    coverage_tasks = []
+    # the shards of a run never write to the same paths, even when they share an output directory
+    shard = f".shard-{args.shard[0]}-of-{args.shard[1]}" if args.shard else ""
+    if args.metrics_only:
+        # the metrics of a file are its only output, kept apart from the manifest of the CFGs of the project
+        sink, output_dir = None, None
+        manifest_path = f"{args.index}{shard}.manifest.jsonl"
+    elif args.sink:
+        sink_path = args.sink_path or f"test_output/{project_name}{shard}{SINK_SUFFIXES[args.sink]}"
+        os.makedirs(os.path.dirname(sink_path) or ".", exist_ok=True)
+        options = {"resume": True} if args.resume else {}
+        if args.compress_workers is not None:
+            options["workers"] = args.compress_workers
+        sink, output_dir = SINKS[args.sink](sink_path, **options), project_name
+        manifest_path = f"{sink_path}.manifest.jsonl"
+    else:
+        sink, output_dir = None, f"test_output/{project_name}"
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = f"{output_dir}/manifest{shard}.jsonl"
+    index = CorpusIndex(args.index) if args.index else None
+    manifest = Manifest(manifest_path, resume=args.resume, outputs=[sink, index])
+    profiler = profiling.Profiler(args.profile_top) if args.profile is not None else None
+    profiling.install(profiler)
+    # preempted machines get a SIGTERM first, which then unwinds like an interrupt and commits the manifest
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
     try:
-        os.makedirs(directory)
-
-    except OSError as error:
-        print(error)
-
-
-def main():
-    is_verbose, project_path, project_name = prompt()
-    files = find_java_files(project_path)
-    makedir(f"test_output/{project_name}")
-    for file in files:
-        makedir(f"test_output/{project_name}/{Path(file).stem}")
-        stream = FileStream(file, encoding="utf8")
-        funcs, token_stream, end_nodes = extract(stream)
-        for g in funcs.items():
-            makedir(f"test_output/{project_name}/{Path(file).stem}/{g[0]}")
-            draw_CFG(g[1], end_nodes[g[0]], f"test_output/{project_name}/{Path(file).stem}/{g[0]}/{g[0]}", token_stream,
-                     verbose=is_verbose)
+        if args.metrics_only:
+            for file, text in java_source_texts(project_path, args.shard):
+                digest = content_hash(text)
+                if manifest.is_done(file, digest):
+                    continue
+                with profiling.unit(file):
+                    functions = METRICS_FRONTENDS[args.frontend](input_stream(text, file))
+                    index.add_file(file, {key: metrics.as_dict() for key, metrics in functions.items()})
+                manifest.record_file(file, digest, [])
+        elif args.pipeline:
+            coverage_tasks, stats, elapsed = run_pipeline(project_path, output_dir, frontend=args.frontend,
+                                                          verbose=is_verbose, sink=sink,
+                                                          coverage=bool(args.coverage),
+                                                          parse_workers=args.parse_workers,
+                                                          render_workers=args.render_workers, manifest=manifest,
+                                                          shard=args.shard, index=index,
+                                                          index_prime_paths=args.index_prime_paths, profiler=profiler)
+            print(report_stages(stats, elapsed))
+        else:
+            for file, text in java_source_texts(project_path, args.shard):
+                digest = content_hash(text)
+                if manifest.is_done(file, digest):
+                    coverage_tasks += manifest.coverage_tasks(file)
+                    continue
+                outputs, tasks, metrics = [], [], {}
+                with profiling.unit(file):
+                    stream = input_stream(text, file)
+                    if incremental is not None:
+                        funcs, token_stream, end_nodes = incremental.extract(stream, file)
+                    else:
+                        funcs, token_stream, end_nodes = FRONTENDS[args.frontend](stream)
+                    for key, g in funcs.items():
+                        prefix = f"{output_dir}/{output_name(project_path, file)}/{path_name(key)}/{path_name(key)}"
+                        with profiling.unit(key):
+                            draw_CFG(g, end_nodes[key], prefix, token_stream, verbose=is_verbose, sink=sink)
+                            if g.nodes:
+                                outputs += [f"{prefix}-cfg.gv", f"{prefix}-cfg.gv.png"]
+                            if args.coverage:
+                                tasks.append(make_task(file, key, g, end_nodes[key], f"{prefix}-coverage.json"))
+                            if index is not None:
+                                metrics[key] = method_metrics(g, end_nodes[key], args.index_prime_paths)
+                if index is not None:
+                    index.add_file(file, metrics)
+                coverage_tasks += tasks
+                manifest.record_file(file, digest, outputs, tasks)
+
+        if args.coverage:
+            report = f"{output_dir}/coverage-report{shard}.json"
+            summaries = run_coverage(coverage_tasks, args.coverage, workers=args.workers,
+                                     timeout=args.coverage_timeout, max_paths=args.coverage_max_paths, report=report,
+                                     sink=sink, done=lambda task: manifest.coverage_summary(task.output, args.coverage),
+                                     on_result=lambda task, summary: manifest.record_coverage(task.output,
+                                                                                             args.coverage, summary),
+                                     profiler=profiler)
+            cut_off = [summary for summary in summaries if summary["status"] != "ok"]
+            if cut_off:
+                print(f"coverage of {len(cut_off)} of {len(summaries)} methods was cut off, see {report}")
+    finally:
+        if profiler is not None:
+            # also written when the run is interrupted, which is how slow runs usually end
+            profile_dir = args.profile or f"test_output/{project_name}/profile{shard}"
+            profiler.write(profile_dir)
+            print(profiler.report())
+            print(f"profiles written to {profile_dir}")
+        manifest.close()
+        if sink is not None:
+            sink.close()
+        if index is not None:
+            index.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+"""
+Runs the extraction of `cfg_from_stdin` as a pipeline of stages connected by bounded queues, so that reading,
+parsing, rendering and writing overlap:
+
+    read -> parse and build -> render -> emit
+
+Sources are read and outputs are written from asyncio tasks, CFGs are built and turned into DOT sources in a
+process pool, and the DOT sources are rendered by a bounded number of concurrent `dot` subprocesses. A full queue
+blocks the stage feeding it, which keeps the number of files in flight, and so the memory, bounded.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.antlr.input_sources import input_stream, java_source_texts, output_name
+from src.cfg_extractor.incremental import content_hash
+from src.cfg_extractor.method_keys import path_name
+from src.code_coverage.coverage_stage import make_task
+from src.corpus_index import method_metrics
+from src.graph.sinks import write_file
+from src.graph.visual import cfg_to_dot
+from src import profiling
+
+_DONE = object()
+
+
+class StageStats:
+    """Work done by the concurrent workers of a stage."""
+
+    def __init__(self, name, workers):
+        self.name, self.workers = name, workers
+        self.items = 0
+        self.busy = 0.0
+
+    def utilization(self, elapsed):
+        """fraction of the time the workers of the stage spent working rather than waiting on their queues"""
+        return self.busy / (elapsed * self.workers) if elapsed else 0.0
+
+
+def build_file(file, text, frontend, verbose, source_dir, coverage, metrics=False, prime_paths=False,
+               profile=False):
+    """
+    Extracts the CFGs of one source and builds their DOT sources. It runs in a worker process,
+    so it only returns picklable results.
+
+    :param source_dir: directory of the outputs of the source, see `input_sources.output_name`.
+    :param metrics: also compute the metrics of the methods, counting their prime paths with `prime_paths`.
+    :param profile: profile the file and its methods, see `profiling`.
+    :return: for each method, its key, its output path prefix, its DOT source (`None` without a CFG),
+    its coverage task and its metrics, then the profiled units for `Profiler.add`, `None` without `profile`.
+    """
+    if profile:
+        (methods, _), units = profiling.profiled(file, build_file, file, text, frontend, verbose, source_dir,
+                                                 coverage, metrics, prime_paths)
+        return methods, units
+    # deferred, since `cfg_from_stdin` imports this module to run the pipeline
+    from src.cfg_from_stdin import FRONTENDS
+
+    funcs, token_stream, end_nodes = FRONTENDS[frontend](input_stream(text, file))
+    methods = []
+    for key, g in funcs.items():
+        prefix = f"{source_dir}/{path_name(key)}/{path_name(key)}"
+        with profiling.unit(key):
+            task = make_task(file, key, g, end_nodes[key], f"{prefix}-coverage.json") if coverage else None
+            dot = cfg_to_dot(g, end_nodes[key], prefix, token_stream, verbose) if g.nodes else None
+            metrics_of_method = method_metrics(g, end_nodes[key], prime_paths) if metrics else None
+        methods.append((key, prefix, dot, task, metrics_of_method))
+    return methods, None
+
+
+async def render(dot, format):
+    process = await asyncio.create_subprocess_exec("dot", f"-T{format}", stdin=asyncio.subprocess.PIPE,
+                                                   stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    image, error = await process.communicate(dot.encode("utf8"))
+    if process.returncode:
+        raise RuntimeError(f"dot exited with {process.returncode}: {error.decode(errors='replace')}")
+    return image
+
+
+def output_names(prefix, format):
+    return [f"{prefix}-cfg.gv", f"{prefix}-cfg.gv.{format}"]
+
+
+def write_outputs(write, prefix, dot, image, format):
+    dot_name, image_name = output_names(prefix, format)
+    write(dot_name, dot.encode("utf8"))
+    write(image_name, image)
+
+
+def next_source(texts):
+    """:return: the path, text and content hash of the next source, `None` after the last one"""
+    source = next(texts, None)
+    return None if source is None else (*source, content_hash(source[1]))
+
+
+async def run_stages(project_path, output_dir, frontend="antlr", verbose=False, format="png", sink=None,
+                     coverage=False, parse_workers=None, render_workers=None, queue_size=None, manifest=None,
+                     shard=None, index=None, index_prime_paths=False, profiler=None):
+    parse_workers = parse_workers or os.cpu_count() or 1
+    render_workers = render_workers or parse_workers
+    queue_size = queue_size or 2 * max(parse_workers, render_workers)
+    stats = {name: StageStats(name, workers) for name, workers in
+             (("read", 1), ("parse", parse_workers), ("render", render_workers), ("emit", 1))}
+    sources, builds, renders = (asyncio.Queue(queue_size) for _ in range(3))
+    coverage_tasks = []
+    # files whose outputs are not all written yet, with the number of outputs left
+    in_flight = {}
+    # held while writing to the sink, since recording a file in the manifest may flush the sink
+    writing = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+
+    async def timed(stage, work):
+        start = time.perf_counter()
+        result = await work
+        stats[stage].busy += time.perf_counter() - start
+        stats[stage].items += 1
+        return result
+
+    async def read():
+        texts = java_source_texts(project_path, shard)
+        while True:
+            source = await timed("read", asyncio.to_thread(next_source, texts))
+            if source is None:
+                break
+            if manifest is not None and manifest.is_done(source[0], source[2]):
+                coverage_tasks.extend(manifest.coverage_tasks(source[0]))
+                continue
+            await sources.put(source)
+        for _ in range(parse_workers):
+            await sources.put(_DONE)
+
+    def written(file):
+        in_flight[file][0] -= 1
+        if not in_flight[file][0]:
+            _, digest, outputs, tasks = in_flight.pop(file)
+            if manifest is not None:
+                manifest.record_file(file, digest, outputs, tasks)
+
+    async def parse(pool):
+        while (source := await sources.get()) is not _DONE:
+            file, text, digest = source
+            methods, units = await timed("parse", loop.run_in_executor(
+                pool, build_file, file, text, frontend, verbose, f"{output_dir}/{output_name(project_path, file)}",
+                coverage, index is not None, index_prime_paths, profiler is not None))
+            if units is not None:
+                profiler.add(units)
+            tasks = [task for *_, task, _ in methods if task is not None]
+            coverage_tasks.extend(tasks)
+            if index is not None:
+                index.add_file(file, {key: metrics for key, *_, metrics in methods})
+            drawn = [(prefix, dot) for _, prefix, dot, _, _ in methods if dot is not None]
+            outputs = [name for prefix, _ in drawn for name in output_names(prefix, format)]
+            # counts the file itself until all its methods are queued, so that it is not recorded too early
+            in_flight[file] = [len(drawn) + 1, digest, outputs, tasks]
+            for prefix, dot in drawn:
+                await builds.put((file, prefix, dot))
+            async with writing:
+                written(file)
+
+    async def render_dots():
+        while (build := await builds.get()) is not _DONE:
+            file, prefix, dot = build
+            await renders.put((file, prefix, dot, await timed("render", render(dot, format))))
+
+    async def emit():
+        write = write_file if sink is None else sink.write
+        while (rendered := await renders.get()) is not _DONE:
+            async with writing:
+                await timed("emit", asyncio.to_thread(write_outputs, write, *rendered[1:], format))
+                written(rendered[0])
+
+    async def parse_all(pool):
+        await asyncio.gather(read(), *(parse(pool) for _ in range(parse_workers)))
+        for _ in range(render_workers):
+            await builds.put(_DONE)
+
+    async def render_all():
+        await asyncio.gather(*(render_dots() for _ in range(render_workers)))
+        await renders.put(_DONE)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(parse_workers) as pool:
+        stages = [asyncio.create_task(stage) for stage in (parse_all(pool), render_all(), emit())]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # the stages feeding a failed one would block on its full queue forever
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+    return coverage_tasks, list(stats.values()), time.perf_counter() - start
+
+
+def run_pipeline(project_path, output_dir, **options):
+    """
+    Extracts, draws and writes the CFGs of all the Java sources under `project_path` through the pipeline.
+
+    :param output_dir: directory, or name prefix inside the sink, of the outputs.
+    :param options: keyword arguments of `run_stages`. With a `manifest`, the files it records as done are
+    skipped and the files whose outputs are all written are recorded in it.
+    :return: the coverage tasks of the methods, for `run_coverage`, the stats of the stages and the elapsed seconds.
+    """
+    return asyncio.run(run_stages(project_path, output_dir, **options))
+
+
+def report_stages(stats, elapsed):
+    lines = [f"{'stage':<8}{'workers':>8}{'items':>8}{'busy s':>10}{'utilization':>13}"]
+    for stage in stats:
+        lines.append(f"{stage.name:<8}{stage.workers:>8}{stage.items:>8}{stage.busy:>10.2f}"
+                     f"{stage.utilization(elapsed):>13.0%}")
+    return "\n".join(lines)
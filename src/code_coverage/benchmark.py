@@ -0,0 +1,60 @@
+"""
+Compares the size of the test sets and the running time of the prime path coverage methods on random graphs.
+
+    python -m src.code_coverage.benchmark --graphs 200 --nodes 8
+"""
+import argparse
+import random
+import time
+
+import networkx as nx
+
+from .prime_path_coverage import prime_path_coverage_bruteforce, prime_path_coverage_exact, \
+    prime_path_coverage_superset
+
+METHODS = {
+    "superset": prime_path_coverage_superset,
+    "bruteforce": prime_path_coverage_bruteforce,
+    "exact": prime_path_coverage_exact,
+}
+
+
+def random_cfg(nodes, density, rng):
+    """a random graph whose nodes are all reachable from node 0 and all reach the last node"""
+    while True:
+        g = nx.gnp_random_graph(nodes, density, directed=True, seed=rng.randrange(2 ** 32))
+        g.add_edges_from((i, i + 1) for i in range(nodes - 1) if rng.random() < 0.5)
+        if len(nx.descendants(g, 0)) == nodes - 1 and len(nx.ancestors(g, nodes - 1)) == nodes - 1:
+            return g
+
+
+def benchmark(graphs, nodes, density, seed):
+    rng = random.Random(seed)
+    cfgs = [random_cfg(nodes, density, rng) for _ in range(graphs)]
+    results = {}
+    for name, method in METHODS.items():
+        paths = length = 0
+        start = time.perf_counter()
+        for g in cfgs:
+            test_paths = method(g, 0, nodes - 1)[0]
+            paths += len(test_paths)
+            length += sum(len(path) for path in test_paths)
+        results[name] = (paths, length, time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graphs", type=int, default=100)
+    parser.add_argument("--nodes", type=int, default=6)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'method':<12}{'test paths':>12}{'nodes':>10}{'seconds':>10}")
+    for name, (paths, length, seconds) in benchmark(args.graphs, args.nodes, args.density, args.seed).items():
+        print(f"{name:<12}{paths:>12}{length:>10}{seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import networkx as nx
+
+
+def compress_chains(g: nx.DiGraph, first, last):
+    """
+    Collapses each run of chained nodes into a super-node labeled by the first node of the run.
+    A node is chained when it has a single predecessor and a single successor, is not on a cycle
+    and is neither `first` nor `last`. No prime path starts or ends inside such a run,
+    so the prime paths of the compressed graph expand to exactly those of `g`.
+
+    :return: the compressed graph and the nodes each super-node stands for.
+    """
+    chained = {n for n in g.nodes
+               if g.in_degree(n) == 1 and g.out_degree(n) == 1 and n not in (first, last) and not g.has_edge(n, n)}
+    if chained:
+        for component in nx.strongly_connected_components(g):
+            if len(component) > 1:
+                chained -= component
+    if not any(next(iter(g.successors(n))) in chained for n in chained):
+        return g, {}
+
+    representative, members = {}, {}
+    for n in g.nodes:
+        if n in chained and next(iter(g.predecessors(n))) in chained:
+            continue
+        run = [n]
+        while run[-1] in chained and next(iter(g.successors(run[-1]))) in chained:
+            run.append(next(iter(g.successors(run[-1]))))
+        for m in run:
+            representative[m] = n
+        if len(run) > 1:
+            members[n] = run
+
+    h = nx.DiGraph()
+    h.add_nodes_from(representative[n] for n in g.nodes)
+    h.add_edges_from((representative[f], representative[t]) for f, t in g.edges
+                     if representative[f] != representative[t] or f == t)
+    return h, members
+
+
+def expand_path(path, members):
+    """replaces the super-nodes of a path on a compressed graph with the nodes they stand for"""
+    return [m for n in path for m in members.get(n, (n,))]
+
+
+def on_compressed_graph(algorithm, g, first, last):
+    """
+    Runs a test path algorithm of `prime_path_coverage` on the chain-compressed graph
+    and expands its test paths and test requirements back to the nodes of `g`.
+    Anything else the algorithm returns after them, e.g. whether the test paths are minimal, is passed through.
+    """
+    h, members = compress_chains(g, first, last)
+    tps, trs, *rest = algorithm(h, first, last)
+    return ([expand_path(tp, members) for tp in tps],
+            [[expand_path(tr, members) for tr in requirements] for requirements in trs],
+            *rest)
@@ -0,0 +1,218 @@
+"""
+Computes the test requirements and test paths of extracted methods in a pool of worker processes.
+
+Each method is sent to the workers as a structure-only graph (node ids and labeled edges), which is cheap to
+pickle, and is given a time budget and a path budget. Methods exceeding a budget are reported instead of
+stalling the whole run. Methods of the same shape, e.g. accessors, have the same coverage, which is computed once
+for all of them.
+"""
+import json
+import os
+import signal
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import NamedTuple
+
+import networkx as nx
+
+from .graph_coverage import edge_coverage, edge_pair_coverage, node_coverage
+from .path_finder import prime_paths
+from .prime_path_coverage import prime_path_coverage_bruteforce, prime_path_coverage_exact, prime_path_coverage_superset
+from .shape_cache import structural_hash
+from ..graph.sinks import write_file
+from ..profiling import profiled
+
+CRITERIA = {
+    "node": node_coverage,
+    "edge": edge_coverage,
+    "edge-pair": edge_pair_coverage,
+    "prime-superset": prime_path_coverage_superset,
+    "prime-bruteforce": prime_path_coverage_bruteforce,
+    "prime-exact": prime_path_coverage_exact,
+}
+
+# criteria whose test requirements are the prime paths, which are counted against the path budget first
+PRIME_PATH_CRITERIA = {"prime-superset", "prime-bruteforce", "prime-exact"}
+
+OK, TIMEOUT, PATH_LIMIT, FAILED = "ok", "timeout", "path_limit", "failed"
+# test paths of `prime-exact` which are written, but were not proven to be the fewest among its candidates
+NOT_MINIMAL = "not_minimal"
+
+
+class CoverageTask(NamedTuple):
+    file: str
+    method: str
+    nodes: list
+    edges: list
+    first: int
+    last: int
+    output: str
+
+
+class CoverageBudgetExceeded(Exception):
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+
+
+def coverage_graph(g: nx.DiGraph, end_nodes):
+    """
+    Strips the statements from a CFG and joins its end nodes to a virtual exit node,
+    since the coverage algorithms expect a single first and a single last node.
+
+    :return: the node ids, the labeled edges, the first node and the exit node.
+    """
+    nodes = list(g.nodes)
+    edges = [(f, t, label) for f, t, label in g.edges.data("value")]
+    if not nodes:
+        return [0], [], 0, 0
+    exit_node = max(nodes) + 1
+    ends = {node for node, _ in end_nodes} | {node for node in nodes if not g.out_degree(node)}
+    edges += [(node, exit_node, None) for node in nodes if node in ends]
+    return nodes + [exit_node], edges, min(nodes), exit_node
+
+
+def make_task(file, method, g, end_nodes, output) -> CoverageTask:
+    nodes, edges, first, last = coverage_graph(g, end_nodes)
+    return CoverageTask(file, method, nodes, edges, first, last, output)
+
+
+def task_graph(task: CoverageTask) -> nx.DiGraph:
+    g = nx.DiGraph()
+    g.add_nodes_from(task.nodes)
+    g.add_edges_from((f, t, {"value": label}) for f, t, label in task.edges)
+    return g
+
+
+def task_shape(task: CoverageTask):
+    """:return: a key shared by the tasks whose coverage is the same, see `shape_cache.structural_hash`"""
+    return structural_hash(task_graph(task)), task.first, task.last
+
+
+def _raise_budget_exceeded(signum, frame):
+    raise CoverageBudgetExceeded(TIMEOUT, "time budget exceeded")
+
+
+def cover(task: CoverageTask, criterion, timeout=None, max_paths=None, keep_result=False):
+    """
+    Computes the coverage of one method within the given budgets.
+
+    :param timeout: seconds the method may take, unlimited when `None`.
+    :param max_paths: largest number of test requirements or test paths, unlimited when `None`.
+    :param keep_result: return the result under `result` instead of writing it to the `output` path of the task.
+    :return: a JSON-serializable summary whose `status` tells whether a budget was exceeded, or whether the test
+    paths of `prime-exact` were not proven minimal among its candidates.
+    """
+    g = task_graph(task)
+    result = {"file": task.file, "method": task.method, "criterion": criterion,
+              "first": task.first, "last": task.last, "test_paths": [], "test_requirements": []}
+
+    timer = timeout and hasattr(signal, "setitimer")
+    if timer:
+        previous = signal.signal(signal.SIGALRM, _raise_budget_exceeded)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        if max_paths is not None and criterion in PRIME_PATH_CRITERIA:
+            requirements = len(prime_paths(g, task.first, task.last))
+            if requirements > max_paths:
+                raise CoverageBudgetExceeded(PATH_LIMIT, f"{requirements} test requirements")
+        test_paths, test_requirements, *minimal = CRITERIA[criterion](g, task.first, task.last)
+        if max_paths is not None and len(test_paths) > max_paths:
+            raise CoverageBudgetExceeded(PATH_LIMIT, f"{len(test_paths)} test paths")
+        result.update(status=OK, test_paths=test_paths, test_requirements=test_requirements)
+        if minimal and not minimal[0]:
+            result.update(status=NOT_MINIMAL, reason="test paths not proven minimal among the candidates within the "
+                                                     "search budget")
+    except CoverageBudgetExceeded as error:
+        result.update(status=error.status, reason=str(error))
+    except Exception as error:
+        result.update(status=FAILED, reason=f"{type(error).__name__}: {error}")
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    result["elapsed"] = round(time.perf_counter() - start, 6)
+
+    summary = {key: result[key] for key in ("file", "method", "status", "reason", "elapsed") if key in result}
+    if keep_result:
+        summary["result"] = result
+    else:
+        os.makedirs(os.path.dirname(task.output) or ".", exist_ok=True)
+        with open(task.output + ".tmp", "w", encoding="utf8") as file:
+            json.dump(result, file)
+        os.replace(task.output + ".tmp", task.output)
+    return summary
+
+
+def profiled_cover(task: CoverageTask, **options):
+    """:return: the summary of `cover` and the profile of the coverage of the method"""
+    return profiled(f"{task.file}::{task.method}::coverage", cover, task, kind="methods", **options)
+
+
+def run_coverage(tasks, criterion, workers=None, timeout=None, max_paths=None, report=None, sink=None,
+                 done=None, on_result=None, profiler=None):
+    """
+    Runs the coverage stage over `tasks` and writes each result to the `output` path of its task.
+
+    :param report: path of a JSON report listing the methods that were cut off or failed.
+    :param sink: `OutputSink` receiving the results and the report under their paths, written as files when `None`.
+    :param done: function returning the summary of a task whose result was written by a previous run, or `None`.
+    Those tasks are not run again.
+    :param on_result: function called with each task and its summary once its result is written.
+    :param profiler: `Profiler` receiving the profile of the coverage of each method, computed in the workers.
+    :return: the summaries of all methods.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"unknown coverage criterion {criterion!r}, expected one of {sorted(CRITERIA)}")
+
+    tasks = list(tasks)
+    summaries = [done(task) if done is not None else None for task in tasks]
+    # the tasks left to run by shape, only the first task of each shape is run
+    shapes = defaultdict(list)
+    for i, summary in enumerate(summaries):
+        if summary is None:
+            shapes[task_shape(tasks[i])].append(i)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        work = cover if profiler is None else profiled_cover
+        results = pool.map(partial(work, criterion=criterion, timeout=timeout, max_paths=max_paths, keep_result=True),
+                           (tasks[same_shape[0]] for same_shape in shapes.values()),
+                           chunksize=max(1, len(shapes) // (4 * (workers or os.cpu_count() or 1))))
+        # results are handled as they come, so that an interruption only loses the ones in flight
+        for same_shape, summary in zip(shapes.values(), results):
+            if profiler is not None:
+                summary, units = summary
+                profiler.add(units)
+            result = summary.pop("result")
+            for i in same_shape:
+                task = tasks[i]
+                result.update(file=task.file, method=task.method)
+                content = json.dumps(result).encode("utf8")
+                if sink is not None:
+                    sink.write(task.output, content)
+                else:
+                    write_file(task.output, content)
+                summaries[i] = {**summary, "file": task.file, "method": task.method}
+                if on_result is not None:
+                    on_result(task, summaries[i])
+
+    if report is not None:
+        cut_off = [summary for summary in summaries if summary["status"] != OK]
+        content = json.dumps({"criterion": criterion, "methods": len(summaries), "cut_off": cut_off}, indent=2)
+        if sink is not None:
+            sink.write(report, content.encode("utf8"))
+        else:
+            with open(report, "w", encoding="utf8") as file:
+                file.write(content)
+    return summaries
+
+
+def merge_reports(reports):
+    """combines the reports of runs over disjoint sets of methods, e.g. the shards of a corpus, into one"""
+    criteria = {report["criterion"] for report in reports}
+    if len(criteria) > 1:
+        raise ValueError(f"can not merge coverage reports of different criteria {sorted(criteria)}")
+    return {"criterion": reports[0]["criterion"], "methods": sum(report["methods"] for report in reports),
+            "cut_off": [summary for report in reports for summary in report["cut_off"]]}
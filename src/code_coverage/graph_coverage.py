@@ -0,0 +1,124 @@
+"""
+Node, edge and edge-pair coverage, cheap criteria for runs where prime path coverage costs too much.
+
+Each test requirement is completed into a test path by the shortest path from `first` to its head and
+the shortest path from its tail to `last`, both read off one BFS tree. Requirements already covered by
+an earlier test path are skipped, so the cost is linear in the size of the graph times the length of
+the test paths.
+"""
+from collections import deque
+
+import networkx as nx
+
+
+def bfs_parents(neighbors, source):
+    """
+    Builds a BFS tree from `source`.
+
+    :param neighbors: function giving the neighbors of a node, e.g., `g.successors` or `g.predecessors`.
+    :return: a dictionary from each reached node to its parent, `None` for `source`.
+    """
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for neighbor in neighbors(node):
+            if neighbor not in parents:
+                parents[neighbor] = node
+                queue.append(neighbor)
+    return parents
+
+
+class PathCompleter:
+    """Completes sub-paths of a graph into test paths, from `first` to `last`, along shortest paths."""
+
+    def __init__(self, g: nx.DiGraph, first, last):
+        self.first, self.last = first, last
+        # the parent of a node in the tree of `last` is its next node on a shortest path to `last`
+        self.prefix_parents = bfs_parents(g.successors, first)
+        self.suffix_parents = bfs_parents(g.predecessors, last)
+
+    def is_feasible(self, path):
+        return path[0] in self.prefix_parents and path[-1] in self.suffix_parents
+
+    def prefix(self, node):
+        """the shortest path from `first` to `node`, without `node`"""
+        nodes = []
+        while node != self.first:
+            node = self.prefix_parents[node]
+            nodes.append(node)
+        return nodes[::-1]
+
+    def suffix(self, node):
+        """the shortest path from `node` to `last`, without `node`"""
+        nodes = []
+        while node != self.last:
+            node = self.suffix_parents[node]
+            nodes.append(node)
+        return nodes
+
+    def complete(self, path):
+        """
+        :return: `path` extended to a test path, or `None` when `path` is unreachable from `first` or can not reach `last`.
+        """
+        if not self.is_feasible(path):
+            return None
+        return self.prefix(path[0]) + list(path) + self.suffix(path[-1])
+
+
+def node_requirements(g: nx.DiGraph):
+    return [(node,) for node in g.nodes]
+
+
+def edge_requirements(g: nx.DiGraph):
+    # a node without edges can only be covered as a path of length zero
+    return [edge for edge in g.edges] + [(node,) for node in g.nodes if not g.degree(node)]
+
+
+def edge_pair_requirements(g: nx.DiGraph):
+    # the paths of length up to two, where the shorter ones can not be extended to longer ones
+    pairs = [(a, b, c) for a, b in g.edges for c in g.successors(b)]
+    edges = [(a, b) for a, b in g.edges if not g.out_degree(b) and not g.in_degree(a)]
+    return pairs + edges + [(node,) for node in g.nodes if not g.degree(node)]
+
+
+def cover_requirements(g: nx.DiGraph, first, last, requirements):
+    """
+    Greedily builds test paths for `requirements`, each one a tuple of nodes, completing every requirement
+    not covered yet. Infeasible requirements are left out.
+
+    :return: the test paths and, for each one, the requirements it covers, like the prime path coverage functions.
+    """
+    length = max((len(requirement) for requirement in requirements), default=1)
+    completer = PathCompleter(g, first, last)
+    wanted = set(requirements)
+    covered = set()
+    test_paths, test_requirements = [], []
+    for requirement in requirements:
+        if requirement in covered:
+            continue
+        test_path = completer.complete(requirement)
+        if test_path is None:
+            continue
+        toured = {}
+        for i in range(len(test_path)):
+            for j in range(i + 1, min(i + length, len(test_path)) + 1):
+                sub_path = tuple(test_path[i:j])
+                if sub_path in wanted:
+                    toured.setdefault(sub_path)
+        covered.update(toured)
+        test_paths.append(test_path)
+        test_requirements.append([list(sub_path) for sub_path in toured])
+    return test_paths, test_requirements
+
+
+def node_coverage(g, first, last):
+    return cover_requirements(g, first, last, node_requirements(g))
+
+
+def edge_coverage(g, first, last):
+    return cover_requirements(g, first, last, edge_requirements(g))
+
+
+def edge_pair_coverage(g, first, last):
+    return cover_requirements(g, first, last, edge_pair_requirements(g))
@@ -0,0 +1,175 @@
+"""
+Finds the smallest set of test paths covering the test requirements, for the teams paying per executed test.
+
+Candidate test paths are encoded as bitmasks over the requirements they tour, and the minimum set cover is
+found by branch-and-bound, starting from the greedy cover as the upper bound. Above `max_exact` requirements
+the search may take exponential time, so the greedy cover is returned instead. Either way, the caller is told whether
+the cover was proven minimal among the candidates, which include the test paths of the heuristics, so that the cover
+is never larger than theirs; a smaller cover may still exist with test paths that are not candidates.
+"""
+from .graph_coverage import PathCompleter, bfs_parents
+
+
+def _ones(mask):
+    return bin(mask).count("1")
+
+
+def coverage_masks(candidates, requirements):
+    """
+    :return: for each candidate test path, the bitmask of the requirements it tours,
+    where bit `i` stands for `requirements[i]`.
+    """
+    bits = {tuple(requirement): 1 << i for i, requirement in enumerate(requirements)}
+    length = max((len(requirement) for requirement in requirements), default=1)
+    masks = []
+    for path in candidates:
+        mask = 0
+        for i in range(len(path)):
+            for j in range(i + 1, min(i + length, len(path)) + 1):
+                mask |= bits.get(tuple(path[i:j]), 0)
+        masks.append(mask)
+    return masks
+
+
+def joined_candidates(g, TR, completer):
+    """
+    Joins each pair of feasible requirements, `a` then `b`, into one test path: on their longest overlap when
+    `b` starts with an end of `a`, else along a shortest path from the last node of `a` to the first node of `b`.
+    A minimum cover can only be as small as its candidates allow, and single requirement completions rarely
+    share test paths.
+    """
+    TR = [tr for tr in TR if completer.is_feasible(tr)]
+    parents = {end: bfs_parents(g.successors, end) for end in {tr[-1] for tr in TR}}
+    for a in TR:
+        for b in TR:
+            if a is b:
+                continue
+            overlap = next((i for i in range(min(len(a), len(b)), 0, -1) if a[-i:] == b[:i]), 0)
+            if overlap:
+                yield completer.complete(a + b[overlap:])
+            elif b[0] in parents[a[-1]]:
+                bridge, node = [], parents[a[-1]][b[0]]
+                while node != a[-1]:
+                    bridge.append(node)
+                    node = parents[a[-1]][node]
+                yield completer.complete(a + bridge[::-1] + b)
+
+
+def greedy_cover(masks, universe, costs):
+    """
+    Picks the candidate covering the most uncovered requirements, the cheapest among equals, until all are covered.
+
+    :return: indices of the chosen candidates.
+    """
+    chosen, covered = [], 0
+    while covered != universe:
+        best = max(range(len(masks)), key=lambda i: (_ones(masks[i] & ~covered), -costs[i]))
+        chosen.append(best)
+        covered |= masks[best]
+    return chosen
+
+
+def exact_cover(masks, universe, costs, max_branches=100000):
+    """
+    Finds a minimum number of candidates covering `universe` by branch-and-bound. Each step branches on the
+    candidates covering the lowest uncovered requirement. A branch is cut when it could not beat the best cover
+    found so far, even given one more candidate for each uncovered requirement no candidate shares with
+    the ones counted before.
+
+    :param max_branches: number of branches after which the best cover found so far is returned.
+
+    :return: indices of the chosen candidates, and whether the search finished, proving that no smaller cover exists.
+    """
+    # candidates covered by another one never take part in a minimum cover
+    kept = []
+    for i in sorted(range(len(masks)), key=lambda i: (-_ones(masks[i]), costs[i])):
+        if masks[i] and not any(masks[i] | masks[j] == masks[j] for j in kept):
+            kept.append(i)
+    covering, neighbors = {}, {}
+    for i in kept:
+        mask = masks[i]
+        while mask:
+            bit = mask & -mask
+            covering.setdefault(bit, []).append(i)
+            neighbors[bit] = neighbors.get(bit, 0) | masks[i]
+            mask ^= bit
+
+    best = greedy_cover([masks[i] for i in kept], universe, [costs[i] for i in kept])
+    best = [kept[i] for i in best]
+    chosen = []
+    branches = 0
+
+    def search(covered):
+        nonlocal best, branches
+        branches += 1
+        if branches > max_branches:
+            return
+        if covered == universe:
+            best = chosen[:]
+            return
+        remaining = universe & ~covered
+        bound, independent = len(chosen), remaining
+        while independent and bound < len(best):
+            bound += 1
+            independent &= ~neighbors[independent & -independent]
+        if bound >= len(best):
+            return
+        options = covering[remaining & -remaining]
+        for i in sorted(options, key=lambda i: -_ones(masks[i] & remaining)):
+            chosen.append(i)
+            search(covered | masks[i])
+            chosen.pop()
+
+    search(0)
+    return best, branches <= max_branches
+
+
+def minimum_test_set(g, candidates, TR, first, last, max_exact=64, max_branches=100000, heuristic_covers=()):
+    """
+    Chooses the fewest test paths covering every requirement of `TR` that some test path can cover, among
+    `candidates`, the paths of `heuristic_covers`, the completions of the requirements no candidate covers and,
+    below `max_exact`, the completions of each pair of requirements.
+
+    :param max_exact: largest number of requirements solved exactly, the greedy cover is used above it.
+    :param max_branches: budget of the exact search, see `exact_cover`.
+    :param heuristic_covers: test paths covering `TR` found by heuristics, e.g. `prime_path_coverage_superset`.
+    The result is never larger than any of them.
+    :return: the test paths and, for each one, the requirements it covers, like `minimize`, and whether they were
+    proven to be the fewest among the candidates, which they are not when the greedy cover is used or the search
+    ran out of branches.
+    """
+    TR = [list(tr) for tr in dict.fromkeys(tuple(tr) for tr in TR)]
+    heuristic_covers = [list(dict.fromkeys(tuple(path) for path in cover)) for cover in heuristic_covers]
+    candidates = [list(path) for path in dict.fromkeys([*(tuple(path) for path in candidates),
+                                                        *(path for cover in heuristic_covers for path in cover)])]
+    masks = coverage_masks(candidates, TR)
+
+    covered = 0
+    for mask in masks:
+        covered |= mask
+    completer = PathCompleter(g, first, last)
+    for i, tr in enumerate(TR):
+        if not covered >> i & 1 and completer.is_feasible(tr):
+            candidates.append(completer.complete(tr))
+            masks.append(coverage_masks(candidates[-1:], TR)[0])
+            covered |= masks[-1]
+
+    if len(TR) > max_exact:
+        chosen, minimal = greedy_cover(masks, covered, [len(path) for path in candidates]), False
+        # unlike the exact search, the greedy cover may be larger than a heuristic one
+        positions = {tuple(path): i for i, path in enumerate(candidates)}
+        for cover in heuristic_covers:
+            indices = [positions[path] for path in cover]
+            union = 0
+            for i in indices:
+                union |= masks[i]
+            if len(indices) < len(chosen) and union == covered:
+                chosen = indices
+    else:
+        joined = [list(path) for path in dict.fromkeys(map(tuple, joined_candidates(g, TR, completer)))]
+        candidates += joined
+        masks += coverage_masks(joined, TR)
+        chosen, minimal = exact_cover(masks, covered, [len(path) for path in candidates], max_branches)
+    return ([candidates[i] for i in chosen],
+            [[tr for j, tr in enumerate(TR) if masks[i] >> j & 1] for i in chosen],
+            minimal)
@@ -1,6 +1,9 @@
 import networkx as nx
 from collections import deque
 
+from .chain_compression import compress_chains, expand_path
+from .scc_paths import find_prime_paths_by_scc
+
 
 def change_str_list(lis):
     return list(map(int, lis))
@@ -123,7 +126,15 @@ def simple_paths(g):
     return sims
 
 
-def prime_paths(g, first, last):
-    graph = read_graph(g, first, last)
-    primes = findPrimePaths(graph)
-    return primes
+def prime_paths(g, first, last, compress=True, decompose=True, workers=None):
+    """
+    :param compress: enumerate on the chain-compressed graph, see `chain_compression.compress_chains`.
+    :param decompose: enumerate per strongly connected component, see `scc_paths.find_prime_paths_by_scc`.
+    :param workers: number of processes enumerating the components when decomposing.
+    """
+    h, members = compress_chains(g, first, last) if compress else (g, {})
+    primes = find_prime_paths_by_scc(h, workers) if decompose else findPrimePaths(read_graph(h, first, last))
+    if not members:
+        return primes
+    # expanded paths are put back in the order of `findPrimePaths`
+    return sorted((expand_path(path, members) for path in primes), key=lambda a: (len(a), a), reverse=True)
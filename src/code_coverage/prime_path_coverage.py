@@ -1,6 +1,9 @@
 import networkx as nx
 import math
 from collections import defaultdict
+from .chain_compression import on_compressed_graph
+from .graph_coverage import PathCompleter
+from .minimum_test_set import minimum_test_set
 from .path_finder import prime_paths
 
 
@@ -184,36 +187,39 @@ def spliting_super(g, super_req, TP, first, last):
         else:
             go_to_brute.append(i)
 
-    ctp = brute_force(TP, go_to_brute, first, last)
+    ctp = brute_force(g, TP, go_to_brute, first, last)
+    # a fragment running past `last` can not be completed, so the requirements it holds are completed on their own
+    ctp = brute_force(g, ctp, TR, first, last)
     last_tp, last_tr = minimize(ctp, TR)
     result_tp = last_tp + ans_tp
     result_tr = last_tr + ans_tr
     return result_tp, result_tr
 
 
-def brute_force(TP, TR, first, last):
-    # you can find method definition and functionality in article.
+def toured_sub_paths(paths, length):
+    # every sub-path of at most `length` nodes toured by `paths`
+    toured = set()
+    for path in paths:
+        for i in range(len(path)):
+            for j in range(i + 1, min(i + length, len(path)) + 1):
+                toured.add(tuple(path[i:j]))
+    return toured
+
 
-    # each test requirement tri ∈ T R that is not covered by T P
-    not_covered = list()
-    res = list()
+def brute_force(g, TP, TR, first, last):
+    # you can find method definition and functionality in article.
+    # each test requirement tri ∈ T R that is not covered by T P is extended along the shortest paths
+    # from `first` and to `last`, while the test paths of T P are kept for the other ones.
+    res = dict.fromkeys(tuple(tp) for tp in TP if tp[0] == first and tp[-1] == last)
+    TR = list(dict.fromkeys(tuple(tr) for tr in TR))
+    toured = toured_sub_paths(res, max((len(tr) for tr in TR), default=1))
+
+    completer = PathCompleter(g, first, last)
+    completions = dict()
     for tr in TR:
-        for tp in TP:
-            if check(tp, tr) is False:
-                if tr not in not_covered:
-                    not_covered.append(tr)
-    for path in not_covered:
-        new_path = []
-        new_path = path.copy()
-        while new_path[0] != first or new_path[-1] != last:
-            for tp in TP:
-                if new_path[0] != first and new_path[0] in tp:
-                    new_path = tp[:tp.index(new_path[0])] + new_path[:]
-                elif new_path[-1] != last and new_path[-1] in tp:
-                    new_path = new_path[:] + tp[tp.index(new_path[-1]) + 1:]
-        if new_path not in res:
-            res.append(new_path)
-    return res
+        if tr not in toured and completer.is_feasible(tr):
+            completions.setdefault(tuple(completer.complete(tr)))
+    return [list(path) for path in list(completions) + [tp for tp in res if tp not in completions]]
 
 
 def minimizing(CTP, TR):
@@ -273,8 +279,10 @@ def minimize(CTP, TR):
     return result_tp, result_tr
 
 
-def prime_path_coverage_superset(g, first, last):
+def prime_path_coverage_superset(g, first, last, compress_chains=False):
     # firs method for prime path coverage.
+    if compress_chains:
+        return on_compressed_graph(prime_path_coverage_superset, g, first, last)
     P = compute_P(g, first)
     TP = compute_TP(g, P, first, last)
     super_req = super_request(g, first, last)
@@ -282,12 +290,31 @@ def prime_path_coverage_superset(g, first, last):
     return end_tp, end_tr
 
 
-def prime_path_coverage_bruteforce(g, first, last):
+def prime_path_coverage_bruteforce(g, first, last, compress_chains=False):
     # second method for prime path coverage.
+    if compress_chains:
+        return on_compressed_graph(prime_path_coverage_bruteforce, g, first, last)
 
     TR = prime_path(g, first, last)
     P = compute_P(g, first)
     TP = compute_TP(g, P, first, last)
-    ctp = brute_force(TP, TR, first, last)
+    ctp = brute_force(g, TP, TR, first, last)
     end_tp, end_tr = minimize(ctp, TR)
     return end_tp, end_tr
+
+
+def prime_path_coverage_exact(g, first, last, compress_chains=False, max_exact=64):
+    # third method for prime path coverage, the fewest test paths for methods with up to `max_exact` prime paths.
+    # also returns whether they were proven to be the fewest among the candidates, see `minimum_test_set`.
+    if compress_chains:
+        return on_compressed_graph(lambda h, f, l: prime_path_coverage_exact(h, f, l, max_exact=max_exact),
+                                   g, first, last)
+
+    TR = prime_path(g, first, last)
+    P = compute_P(g, first)
+    TP = compute_TP(g, P, first, last)
+    ctp = brute_force(g, TP, TR, first, last)
+    # the test paths of the other two methods are candidates, so that this one never needs more test paths
+    superset_tp, _ = spliting_super(g, super_request(g, first, last), TP, first, last)
+    bruteforce_tp, _ = minimize(ctp, TR)
+    return minimum_test_set(g, ctp, TR, first, last, max_exact, heuristic_covers=[superset_tp, bruteforce_tp])
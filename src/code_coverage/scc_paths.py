@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+
+
+def component_paths(nodes, edges):
+    """
+    Enumerates the simple paths and the simple cycles inside one strongly connected component.
+
+    :param nodes: nodes of the component.
+    :param edges: edges between the nodes of the component.
+    :return: the simple paths grouped by their first node, and every rotation of every simple cycle.
+    """
+    successors = {node: [] for node in nodes}
+    for f, t in edges:
+        successors[f].append(t)
+
+    paths, cycles = {}, []
+    for start in nodes:
+        paths[start] = []
+        stack = [(start,)]
+        while stack:
+            path = stack.pop()
+            paths[start].append(path)
+            for node in successors[path[-1]]:
+                if node == start:
+                    cycles.append(path + (start,))
+                elif node not in path:
+                    stack.append(path + (node,))
+    return paths, cycles
+
+
+def find_prime_paths_by_scc(g: nx.DiGraph, workers=None):
+    """
+    Finds the prime paths of a graph like `path_finder.findPrimePaths`, one strongly connected component at a time.
+    Cycles never leave their component, and any other simple path visits the components in the order of
+    the condensation, one segment per component. So the simple paths of each component are enumerated on
+    their own and only the segments that make up prime paths are chained across the components.
+
+    :param workers: number of processes enumerating the components with loops in parallel.
+    :return: the prime paths sorted as `path_finder.findPrimePaths` sorts them.
+    """
+    components = list(nx.strongly_connected_components(g))
+    component_of = {node: i for i, component in enumerate(components) for node in component}
+    jobs = [(list(component), [(f, t) for f in component for t in g.successors(f) if t in component])
+            for component in components]
+
+    looping = [job for job in jobs if job[1]]
+    if workers and workers > 1 and len(looping) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(component_paths, *zip(*looping)))
+    else:
+        results = [component_paths(*job) for job in looping]
+
+    segments = {node: [(node,)] for node in g.nodes}
+    primes = []
+    for paths, cycles in results:
+        segments.update(paths)
+        primes.extend(cycles)
+
+    def is_prime(path):
+        nodes = set(path)
+        return (all(node in nodes and node != path[-1] for node in g.predecessors(path[0])) and
+                all(node in nodes and node != path[0] for node in g.successors(path[-1])))
+
+    # a prime path can not be extended at its head, so its first segment already holds every predecessor
+    stack = [segment for node in g.nodes for segment in segments[node]
+             if all(pred in segment for pred in g.predecessors(node))]
+    while stack:
+        path = stack.pop()
+        if len(path) > 1 and is_prime(path):
+            primes.append(path)
+        last = path[-1]
+        for node in g.successors(last):
+            if component_of[node] != component_of[last]:
+                stack.extend(path + segment for segment in segments[node])
+
+    return [list(path) for path in sorted(primes, key=lambda a: (len(a), a), reverse=True)]
@@ -0,0 +1,51 @@
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+
+import networkx as nx
+
+from .path_finder import prime_paths
+
+
+def structural_hash(g: nx.DiGraph, end_nodes=()) -> str:
+    """
+    Hashes the shape of a CFG: its nodes in order, its labeled edges and its end nodes.
+    The statements held by the nodes are ignored, so methods with the same control flow share a hash.
+    """
+    shape = {"nodes": list(g.nodes),
+             "edges": [(f, t, label) for f, t, label in g.edges.data("value")],
+             "end_nodes": [list(end) for end in end_nodes]}
+    return hashlib.sha256(json.dumps(shape).encode("utf8")).hexdigest()
+
+
+class ShapeCache:
+    """An LRU cache of results computed on CFG shapes, e.g., prime paths."""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = self.misses = 0
+        self.__items = OrderedDict()
+
+    def get_or_compute(self, key, compute):
+        if key in self.__items:
+            self.hits += 1
+            self.__items.move_to_end(key)
+        else:
+            self.misses += 1
+            self.__items[key] = compute()
+            while len(self.__items) > self.max_size:
+                self.__items.popitem(last=False)
+        # results are lists the coverage algorithms change in place, so callers get their own copy
+        return copy.deepcopy(self.__items[key])
+
+    def __len__(self):
+        return len(self.__items)
+
+
+SHAPES = ShapeCache()
+
+
+def cached_prime_paths(g, first, last, cache=SHAPES):
+    return cache.get_or_compute((structural_hash(g), "prime_paths", first, last),
+                                lambda: prime_paths(g, first, last))
@@ -0,0 +1,52 @@
+"""
+Checks that the skeleton frontend agrees with the ANTLR frontend: both extract every Java source under a project,
+and the keys, graphs and end nodes of their CFGs are compared on their serialized form, which holds the text and
+lines of the statements in place of the parse tree contexts and token spans.
+
+    python -m src.compare_frontends test_source
+"""
+import argparse
+import sys
+
+from src.antlr.input_sources import input_stream, java_source_texts
+from src.graph.serialize import cfgs_to_dict
+
+
+def extract_dict(frontend, file, text):
+    # deferred, since `cfg_from_stdin` imports the whole extraction
+    from src.cfg_from_stdin import FRONTENDS
+
+    funcs, token_stream, end_nodes = FRONTENDS[frontend](input_stream(text, file))
+    return cfgs_to_dict(funcs, end_nodes, token_stream)
+
+
+def compare_file(file, text, frontends=("antlr", "skeleton")):
+    """:return: a line describing each difference between the CFGs the two frontends extract from `text`"""
+    expected, actual = (extract_dict(frontend, file, text) for frontend in frontends)
+    differences = [f"{file}: {key} only extracted by {frontends[0]}" for key in expected.keys() - actual.keys()]
+    differences += [f"{file}: {key} only extracted by {frontends[1]}" for key in actual.keys() - expected.keys()]
+    for key in expected.keys() & actual.keys():
+        for part in ("nodes", "edges", "end_nodes"):
+            # the same graph may be built in another order
+            if sorted(map(repr, expected[key][part])) != sorted(map(repr, actual[key][part])):
+                differences.append(f"{file}: {key} has different {part}:\n"
+                                   f"  {frontends[0]}: {expected[key][part]}\n  {frontends[1]}: {actual[key][part]}")
+    return differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the CFGs of the ANTLR and skeleton frontends.")
+    parser.add_argument("project_path", help="directory of Java files and zip/jar archives of them, or an archive")
+    args = parser.parse_args(argv)
+    files = differences = 0
+    for file, text in java_source_texts(args.project_path):
+        files += 1
+        for difference in compare_file(file, text):
+            differences += 1
+            print(difference)
+    print(f"{files} files, {differences} differences")
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
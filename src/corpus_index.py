@@ -0,0 +1,163 @@
+"""
+Persistent SQLite index of the metrics of every extracted method, keyed by file, class and signature, so that
+questions about a whole corpus are answered by queries instead of extracting it again:
+
+    python -m src.corpus_index test_output/project.db --top 100 --by cyclomatic_complexity
+
+An index filled with `--metrics-only` has no CFG metrics, and ranks the methods `--by syntactic_complexity` instead.
+"""
+import argparse
+import sqlite3
+from collections import defaultdict
+
+import networkx as nx
+
+from src.code_coverage.coverage_stage import coverage_graph
+from src.code_coverage.shape_cache import cached_prime_paths
+
+# the metrics counted on the CFG, then the ones counted on the syntax by `metrics_visitor`
+METRICS = ("nodes", "edges", "cyclomatic_complexity", "nesting_depth", "exits", "prime_paths", "graph_copies",
+           "decisions", "syntactic_complexity", "loops", "exit_statements")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS methods (
+    file TEXT NOT NULL,
+    class TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    {", ".join(f"{metric} INTEGER" for metric in METRICS)},
+    PRIMARY KEY (file, class, signature)
+);
+CREATE INDEX IF NOT EXISTS methods_by_complexity ON methods (cyclomatic_complexity DESC);
+"""
+
+
+def split_method_key(key: str):
+    """:return: the qualified class name and the signature of a method key, see `method_keys.method_key`"""
+    head, parameters = key.split("(", 1)
+    class_name, _, name = head.rpartition(".")
+    return class_name, f"{name}({parameters}"
+
+
+def method_metrics(g: nx.DiGraph, end_nodes, count_prime_paths=False) -> dict:
+    """
+    :param g: CFG of a method, as built by the extractors.
+    :param end_nodes: end nodes of the method.
+    :param count_prime_paths: also count the prime paths, which may take exponential time, once per shape.
+    """
+    nodes, edges, first, last = coverage_graph(g, end_nodes)
+    metrics = {"nodes": g.number_of_nodes(), "edges": g.number_of_edges(),
+               # E - N + 2, on the CFG whose exits are joined into one exit node
+               "cyclomatic_complexity": len(edges) - len(nodes) + 2,
+               "nesting_depth": g.graph.get("nesting_depth"),
+               "exits": sum(1 for _, t, _ in edges if t == last),
+               "prime_paths": None,
+               # whole graph copies made while building the CFG, a measure of the cost of its extraction
+               "graph_copies": g.graph.get("graph_copies")}
+    if count_prime_paths:
+        h = nx.DiGraph()
+        h.add_nodes_from(nodes)
+        h.add_edges_from((f, t) for f, t, _ in edges)
+        metrics["prime_paths"] = len(cached_prime_paths(h, first, last))
+    return metrics
+
+
+class CorpusIndex:
+    """
+    Collects method metrics in batches, each one inserted in a single transaction.
+
+    :param batch_size: number of methods buffered before they are inserted, the methods of a file are never split.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        # waits on the locks of the other shards of a run writing to the same index
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # indexes written before a metric was added get its column, empty for the methods they hold
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(methods)")}
+        for metric in METRICS:
+            if metric not in columns:
+                self.connection.execute(f"ALTER TABLE methods ADD COLUMN {metric} INTEGER")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS methods_by_syntactic_complexity "
+                                "ON methods (syntactic_complexity DESC)")
+        self.batch_size = batch_size
+        # buffered rows by the metrics they hold
+        self.__rows = defaultdict(list)
+        self.__count = 0
+        # the class and signature of the methods of each buffered file
+        self.__files = {}
+
+    def add_file(self, file, methods):
+        """
+        Replaces the methods of `file`: the ones it no longer has, e.g. renamed or removed since it was indexed
+        before, are dropped.
+
+        :param methods: the metrics of each method by its key, each by name. Only these metrics are replaced in the
+        index, so that the metrics of a method counted on its CFG and on its syntax, by separate runs, are kept
+        side by side.
+        """
+        self.__files[file] = set()
+        for key, metrics in methods.items():
+            class_name, signature = split_method_key(key)
+            self.__files[file].add((class_name, signature))
+            columns = tuple(metric for metric in METRICS if metric in metrics)
+            self.__rows[columns].append((file, class_name, signature, *(metrics[metric] for metric in columns)))
+        self.__count += len(methods)
+        if self.__count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.__files:
+            return
+        with self.connection:
+            for file, methods in self.__files.items():
+                stale = [(file, class_name, signature) for class_name, signature in self.connection.execute(
+                    "SELECT class, signature FROM methods WHERE file = ?", (file,)) if (class_name, signature)
+                    not in methods]
+                self.connection.executemany("DELETE FROM methods WHERE file = ? AND class = ? AND signature = ?",
+                                            stale)
+            for columns, rows in self.__rows.items():
+                self.connection.executemany(
+                    f"INSERT INTO methods (file, class, signature, {', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' * (3 + len(columns)))}) ON CONFLICT (file, class, signature) "
+                    f"DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in columns)}", rows)
+        self.__rows.clear()
+        self.__count = 0
+        self.__files.clear()
+
+    def top(self, metric="cyclomatic_complexity", limit=100):
+        """:return: the `limit` methods with the highest `metric`, as (file, class, signature, value) rows"""
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r}, expected one of {list(METRICS)}")
+        return self.connection.execute(
+            f"SELECT file, class, signature, {metric} FROM methods WHERE {metric} IS NOT NULL "
+            f"ORDER BY {metric} DESC LIMIT ?", (limit,)).fetchall()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the method metrics of a corpus index.")
+    parser.add_argument("index", help="path of the index written with `cfg_from_stdin --index`")
+    parser.add_argument("--top", type=int, default=100, metavar="N", help="number of methods (default: %(default)s)")
+    parser.add_argument("--by", choices=METRICS, default="cyclomatic_complexity",
+                        help="metric to rank the methods by (default: %(default)s, "
+                             "syntactic_complexity for an index filled with --metrics-only)")
+    args = parser.parse_args(argv)
+    with CorpusIndex(args.index) as index:
+        for file, class_name, signature, value in index.top(args.by, args.top):
+            method = f"{class_name}.{signature}" if class_name else signature
+            print(f"{value:>8}  {file}  {method}")
+
+
+if __name__ == '__main__':
+    main()
@@ -96,8 +96,8 @@ class IDiGraphBuilder(metaclass=abc.ABCMeta):
         """compose (union) with a graph"""
 
     @abc.abstractmethod
-    def reset_node_order(self) -> None:
-        """reset node labels from zero"""
+    def reset_node_order(self) -> Dict[int, int]:
+        """reset node labels from zero and return the changed labels"""
 
     @abc.abstractmethod
     def build(self):
@@ -111,6 +111,11 @@ class IDiGraphBuilder(metaclass=abc.ABCMeta):
     def copy(self) -> "IDiGraphBuilder":
         """return a deep copy of object"""
 
+    @classmethod
+    @abc.abstractmethod
+    def merge_sequence(cls, graphs: Iterable["IDiGraphBuilder"]) -> "IDiGraphBuilder":
+        """merge a sequence of graphs, each one's head into the last node of the previous ones"""
+
     def __or__(self, other: "IDiGraphBuilder") -> "IDiGraphBuilder":
         """compose graphs and merge graph data"""
 
@@ -1,5 +1,3 @@
-from typing import List, Any
-
 import networkx as nx
 from networkx import DiGraph
 
@@ -8,9 +6,15 @@ from src.data_structures.graph.builder_interface import IDiGraphBuilder
 
 class NxDiGraphBuilder(IDiGraphBuilder):
     VALUE = "value"
+    # the number of whole graph copies (copying, relabeling and composing) made by all builders so far
+    copies = 0
 
     def __init__(self):
         self.__graph = DiGraph()
+        # the smallest and the largest node labels are kept up to date on every change,
+        # `None` means they are unknown (after removing a boundary node) and must be recomputed
+        self.__head = self.__last = None
+        self.__bounds_known = True
 
     @property
     def node_keys(self):
@@ -42,17 +46,45 @@ class NxDiGraphBuilder(IDiGraphBuilder):
 
     @property
     def head(self):
-        return min(self.node_keys)
+        self.__ensure_bounds()
+        return self.__head
 
     @property
     def last(self):
-        return max(self.node_keys)
+        self.__ensure_bounds()
+        return self.__last
+
+    def __ensure_bounds(self):
+        if not self.__bounds_known:
+            self.__head = min(self.__graph.nodes, default=None)
+            self.__last = max(self.__graph.nodes, default=None)
+            self.__bounds_known = True
+        if self.__head is None:
+            raise ValueError("an empty graph has no head or last node")
+
+    def __include(self, node):
+        if not self.__bounds_known:
+            return
+        if self.__head is None:
+            self.__head = self.__last = node
+        elif node < self.__head:
+            self.__head = node
+        elif node > self.__last:
+            self.__last = node
+
+    def __exclude(self, node):
+        if node == self.__head or node == self.__last:
+            self.__bounds_known = False
+
+    def __set_bounds(self, head, last, known=True):
+        self.__head, self.__last, self.__bounds_known = head, last, known
 
     def descendants(self, node):
         return nx.descendants(self.__graph, node)
 
     def add_node(self, node=0, value=None):
         self.__graph.add_node(node, value=value)
+        self.__include(node)
         return self
 
     def successors(self, node: int):
@@ -61,11 +93,11 @@ class NxDiGraphBuilder(IDiGraphBuilder):
 
     def get_last_nodes(self):
         last_nodes = []
-        for node in self.node_keys:
-            if not dict(self.node_items)[node]:
-                last_nodes.extend(list(self.predecessors(node)))
+        for node, content in self.__graph.nodes.data(self.VALUE):
+            if not content:
+                last_nodes.extend(self.__graph.predecessors(node))
             elif not self.__graph.out_degree(node):
-                last_nodes.extend([node])
+                last_nodes.append(node)
         return last_nodes
 
     def predecessors(self, node: int):
@@ -74,6 +106,7 @@ class NxDiGraphBuilder(IDiGraphBuilder):
 
     def remove_node(self, node):
         self.__graph.remove_node(node)
+        self.__exclude(node)
         return self
 
     def add_nodes_from(self, nodes):
@@ -81,13 +114,20 @@ class NxDiGraphBuilder(IDiGraphBuilder):
                                (node[0], {self.VALUE: node[1]}))
         ns = [mapper(node) for node in nodes]
         self.__graph.add_nodes_from(ns)
+        for node in ns:
+            self.__include(node if isinstance(node, int) else node[0])
         return self
 
     def remove_nodes_from(self, nodes):
+        nodes = list(nodes)
         self.__graph.remove_nodes_from(nodes)
+        for node in nodes:
+            self.__exclude(node)
 
     def add_edge(self, f, t, value=None):
         self.__graph.add_edge(f, t, value=value)
+        self.__include(f)
+        self.__include(t)
         return self
 
     def remove_edge(self, f, t):
@@ -99,6 +139,9 @@ class NxDiGraphBuilder(IDiGraphBuilder):
                                (edge[0], edge[1], {self.VALUE: edge[2]}))
         es = [mapper(edge) for edge in edges]
         self.__graph.add_edges_from(es)
+        for edge in es:
+            self.__include(edge[0])
+            self.__include(edge[1])
         return self
 
     def remove_edges_from(self, edges):
@@ -106,10 +149,25 @@ class NxDiGraphBuilder(IDiGraphBuilder):
         return self
 
     def compose(self, other):
+        NxDiGraphBuilder.copies += 1
         self.__graph = nx.compose(other.__graph, self.__graph)
+        self.__set_bounds(*self.__union_bounds(other))
+
+    def __union_bounds(self, other):
+        if not (self.__bounds_known and other.__bounds_known):
+            return None, None, False
+        if self.__head is None or other.__head is None:
+            return (self.__head, self.__last, True) if other.__head is None else (other.__head, other.__last, True)
+        return min(self.__head, other.__head), max(self.__last, other.__last), True
 
     def reset_node_order(self):
-        self.__graph = nx.relabel_nodes(self.__graph, {old: new for new, old in enumerate(sorted(self.__graph.nodes))})
+        if not self.__graph or (self.head == 0 and self.last == len(self.__graph) - 1):
+            return {}
+        NxDiGraphBuilder.copies += 1
+        mapping = {old: new for new, old in enumerate(sorted(self.__graph.nodes))}
+        self.__graph = nx.relabel_nodes(self.__graph, mapping)
+        self.__set_bounds(0, len(self.__graph) - 1)
+        return mapping
 
     def reset_list_order(self, diffs):
         end_list = []
@@ -130,27 +188,72 @@ class NxDiGraphBuilder(IDiGraphBuilder):
         return {"nodes": list(self.node_items), "edges": list(self.edge_items)}
 
     def copy(self) -> "IDiGraphBuilder":
+        NxDiGraphBuilder.copies += 1
         g = NxDiGraphBuilder()
         g.__graph = self.__graph.copy()
+        g.__set_bounds(self.__head, self.__last, self.__bounds_known)
+        return g
+
+    @classmethod
+    def merge_sequence(cls, graphs):
+        graphs = [graph for graph in graphs if graph is not None]
+        if len(graphs) < 2:
+            return graphs[0] if graphs else None
+
+        # like `left | right >> left.last`, the head of each graph is merged into the last node
+        # of the graphs before it; the node contents are gathered first and the graph is built once
+        shifts, contents = [], {}
+        last = 0
+        for graph in graphs:
+            shifts.append(last)
+            for node, content in graph.__graph.nodes.data(cls.VALUE):
+                contents.setdefault(node + last, []).append(content)
+            last += graph.last
+
+        # graphs are added from the last one backwards, which keeps the node and edge order of repeated composition
+        preceding = DiGraph()
+        for graph, shift in zip(reversed(graphs[:-1]), reversed(shifts[:-1])):
+            if len(graph) == 1 and not graph.__graph.number_of_edges():
+                # a single statement is fused into the basic block it follows
+                preceding.add_node(graph.head + shift)
+            else:
+                preceding.add_nodes_from(node + shift for node in graph.__graph.nodes)
+                preceding.add_edges_from((f + shift, t + shift, data) for f, t, data in graph.__graph.edges(data=True))
+
+        NxDiGraphBuilder.copies += 1
+        g = NxDiGraphBuilder()
+        g.__graph = nx.compose((graphs[-1] >> shifts[-1]).__graph, preceding)
+        for node, parts in contents.items():
+            g.__graph.nodes[node][cls.VALUE] = parts[0] if len(parts) == 1 else [s for part in parts for s in part]
+        g.__set_bounds(min(graph.head + shift for graph, shift in zip(graphs, shifts)),
+                       max(graph.last + shift for graph, shift in zip(graphs, shifts)))
         return g
 
     def __or__(self, other):
-        common_nodes = set(self.node_keys) & set(other.node_keys)
+        smaller, larger = (self, other) if len(self) <= len(other) else (other, self)
+        common_nodes = [node for node in smaller.__graph if node in larger.__graph]
         common_data_by_nodes = [(node, self[node] + other[node]) for node in common_nodes]
 
+        NxDiGraphBuilder.copies += 1
         g = NxDiGraphBuilder()
         g.__graph = nx.compose(other.__graph, self.__graph)
+        g.__set_bounds(*self.__union_bounds(other))
         for node, data in common_data_by_nodes:
             g[node] = data
         return g
 
     def __rshift__(self, n):
+        NxDiGraphBuilder.copies += 1
         g = NxDiGraphBuilder()
         g.__graph = nx.relabel_nodes(self.__graph, {i: i + n for i in self.__graph.nodes})
+        if self.__head is None:
+            g.__set_bounds(None, None, self.__bounds_known)
+        else:
+            g.__set_bounds(self.__head + n, self.__last + n, self.__bounds_known)
         return g
 
     def __getitem__(self, item):
-        return (self.__graph.edges[item][self.VALUE] if isinstance(item, tuple) else
+        return (self.__graph.edges[item].get(self.VALUE) if isinstance(item, tuple) else
                 self.__graph.nodes[item][self.VALUE])
 
     def __setitem__(self, item, content):
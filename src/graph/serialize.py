@@ -0,0 +1,30 @@
+from src.antlr.rule_utils import extract_exact_text
+
+VALUE = "value"
+
+
+def stringify_statement(rule, token_stream):
+    return {"line": rule.start.line,
+            "end_line": rule.stop.line,
+            "text": extract_exact_text(token_stream, rule)}
+
+
+def cfg_to_dict(graph, end_nodes, token_stream):
+    """
+    Converts an extracted CFG into a JSON-serializable dictionary.
+
+    :param graph: `networkx.DiGraph` built by `CFGExtractorVisitor`.
+    :param end_nodes: end nodes recorded in `CFGExtractorVisitor.functionLastNode`.
+    :param token_stream: token stream the graph statements were parsed from.
+    :return: a dictionary of nodes (with their statements), labeled edges and end nodes.
+    """
+    nodes = [{"id": node,
+              "statements": [stringify_statement(rule, token_stream) for rule in data.get(VALUE) or []]}
+             for node, data in graph.nodes.data()]
+    edges = [{"from": f, "to": t, "label": data.get(VALUE)} for f, t, data in graph.edges.data()]
+    ends = [{"node": node, "label": label} for node, label in end_nodes]
+    return {"nodes": nodes, "edges": edges, "end_nodes": ends}
+
+
+def cfgs_to_dict(functions, end_nodes, token_stream):
+    return {name: cfg_to_dict(graph, end_nodes[name], token_stream) for name, graph in functions.items()}
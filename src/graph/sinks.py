@@ -0,0 +1,208 @@
+"""
+Output sinks streaming all the artifacts of a run (DOT sources, rendered images, coverage results) into a single
+archive, in place of a directory per file and method. Each artifact is written under a relative name such as
+`project/File/method/method-cfg.gv`.
+"""
+import abc
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+BUFFER_SIZE = 1 << 20
+
+# formats that are compressed already and gain nothing from compressing them again
+COMPRESSED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".pdf")
+
+
+def write_file(name, data: bytes):
+    """writes a file atomically, so that an interrupted run leaves either the previous file or the new one"""
+    os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+    with open(name + ".tmp", "wb") as file:
+        file.write(data)
+    os.replace(name + ".tmp", name)
+
+
+class OutputSink(metaclass=abc.ABCMeta):
+    # whether the sink can be reopened to append to the outputs of an interrupted run
+    resumable = False
+    # whether the sink takes a number of `workers` threads compressing the outputs in parallel
+    parallel = False
+
+    @abc.abstractmethod
+    def write(self, name: str, data: bytes):
+        """writes the output `name`"""
+
+    def flush(self):
+        """makes the outputs written so far durable"""
+
+    @abc.abstractmethod
+    def close(self):
+        """writes the outputs still buffered and closes the sink"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TarSink(OutputSink):
+    """Streams the artifacts into a tar file, compressed as a whole with `compression` ("gz", "bz2", "xz" or "")."""
+
+    def __init__(self, path, compression="gz"):
+        self.__file = open(path, "wb", buffering=BUFFER_SIZE)
+        self.__tar = tarfile.open(fileobj=self.__file, mode=f"w|{compression}", bufsize=BUFFER_SIZE)
+
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime = len(data), int(time.time())
+        self.__tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.__tar.close()
+        self.__file.close()
+
+
+class ZipSink(OutputSink):
+    """Writes the artifacts into a zip file, deflating all but the already compressed images."""
+
+    def __init__(self, path):
+        self.__file = open(path, "wb", buffering=BUFFER_SIZE)
+        self.__zip = zipfile.ZipFile(self.__file, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name, data):
+        stored = name.lower().endswith(COMPRESSED_SUFFIXES)
+        self.__zip.writestr(name, data, zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+
+    def close(self):
+        self.__zip.close()
+        self.__file.close()
+
+
+class PackSink(OutputSink):
+    """
+    Appends the artifacts, each one compressed on its own, to a pack file, and appends the offset and size of each
+    entry to an index next to it (`<path>.index.jsonl`), so that any entry can be read without the others.
+    Both files are only appended to while the sink is open, so the pack of an interrupted run can be reopened with
+    `resume` and the entries after the last complete one are dropped.
+
+    :param workers: number of threads compressing entries in parallel, compressing in the writing thread when `None`.
+    """
+    resumable = True
+    parallel = True
+
+    def __init__(self, path, workers=None, level=6, resume=False):
+        self.path, self.level = path, level
+        self.index = read_pack_index(path) if resume else {}
+        self.__offset = max((entry["offset"] + entry["size"] for entry in self.index.values()), default=0)
+        # the index is rewritten without the entries dropped, so that it never points past the end of the pack,
+        # and replaced atomically before the pack is truncated, so that an interruption never loses the entries kept
+        index_path = path + ".index.jsonl"
+        with open(index_path + ".tmp", "w", encoding="utf8") as index_file:
+            index_file.writelines(index_line(name, entry) for name, entry in self.index.items())
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(index_path + ".tmp", index_path)
+        if resume and os.path.exists(path):
+            self.__file = open(path, "r+b", buffering=BUFFER_SIZE)
+            self.__file.truncate(self.__offset)
+            self.__file.seek(self.__offset)
+        else:
+            self.__file = open(path, "wb", buffering=BUFFER_SIZE)
+        self.__index_file = open(index_path, "a", encoding="utf8")
+        self.__pool = ThreadPoolExecutor(workers) if workers and workers > 1 else None
+        # entries being compressed, appended in the order they were written
+        self.__pending = deque()
+        self.__max_pending = 4 * (workers or 1)
+
+    def write(self, name, data):
+        if self.__pool is None:
+            self.__append(name, self.__compress(name, data))
+            return
+        self.__pending.append((name, self.__pool.submit(self.__compress, name, data)))
+        while len(self.__pending) > self.__max_pending:
+            self.__append_next()
+
+    def __compress(self, name, data):
+        if name.lower().endswith(COMPRESSED_SUFFIXES):
+            return False, data
+        return True, zlib.compress(data, self.level)
+
+    def append_entry(self, name, data, compressed):
+        """appends an entry encoded already, e.g. copied from another pack, after the ones being compressed"""
+        while self.__pending:
+            self.__append_next()
+        self.__append(name, (compressed, data))
+
+    def __append_next(self):
+        name, future = self.__pending.popleft()
+        self.__append(name, future.result())
+
+    def __append(self, name, entry):
+        compressed, data = entry
+        self.__file.write(data)
+        self.index[name] = {"offset": self.__offset, "size": len(data), "compressed": compressed}
+        self.__index_file.write(index_line(name, self.index[name]))
+        self.__offset += len(data)
+
+    def flush(self):
+        while self.__pending:
+            self.__append_next()
+        # the pack first, so that a complete index line always points to complete data
+        for file in (self.__file, self.__index_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self):
+        self.flush()
+        if self.__pool is not None:
+            self.__pool.shutdown()
+        self.__file.close()
+        self.__index_file.close()
+
+
+def index_line(name, entry) -> str:
+    return json.dumps({"name": name, **entry}) + "\n"
+
+
+def read_pack_index(path) -> dict:
+    """
+    Reads the index of a pack file written by `PackSink`, up to its last entry whose data is complete.
+
+    :return: a dictionary from the name of each entry to its offset, size and whether it is compressed.
+    """
+    index = {}
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    try:
+        with open(path + ".index.jsonl", encoding="utf8") as lines:
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry["offset"] + entry["size"] > size:
+                    break
+                index[entry.pop("name")] = entry
+    except OSError:
+        pass
+    return index
+
+
+def read_pack_entry(path, name) -> bytes:
+    """reads one entry of a pack file written by `PackSink`"""
+    entry = read_pack_index(path)[name]
+    with open(path, "rb") as pack:
+        pack.seek(entry["offset"])
+        data = pack.read(entry["size"])
+    return zlib.decompress(data) if entry["compressed"] else data
+
+
+SINKS = {"tar": TarSink, "zip": ZipSink, "pack": PackSink}
+
+SINK_SUFFIXES = {"tar": ".tar.gz", "zip": ".zip", "pack": ".pack"}
@@ -1,63 +1,89 @@
-import html
-
 import graphviz as gv
+from graphviz.quoting import quote
 
 from data_structures.graph.builder_interface import IDiGraphBuilder
 from src.antlr.rule_utils import extract_exact_text
+from src.graph.sinks import write_file
 from src.graph.utils import head_node, last_node
 
 FONT_SIZE = "22"
 PEN_WIDTH = "2"
 
 
-def draw_CFG(graph, end_nodes, filename, token_stream=None, format="png", verbose=True):
+def draw_CFG(graph, end_nodes, filename, token_stream=None, format="png", verbose=True, sink=None):
+    """
+    :param sink: `OutputSink` receiving the DOT source and the rendered image, written as files when `None`.
+    """
     if graph.nodes:
-        gr = gv.Digraph(comment=filename, format=format, node_attr={"shape": "none"})
-        gr.node("start", style="filled", fillcolor="#aaffaa", shape="oval", fontsize=FONT_SIZE)
-
-        for node, data in graph.nodes.data():
-            block_contents = (stringify_block(data, token_stream) if verbose else stringify_block_lineno_only(data))
-            gr.node(str(node), label=build_node_template(node, block_contents))
-
-        gr.node("end", style="filled", fillcolor="#aaffaa", shape="oval", fontsize=FONT_SIZE)
-        for f, t, data in graph.edges.data():
-            gr.edge(f"{str(f)}", f"{str(t)}", label=data["value"] if data else '', fontsize=FONT_SIZE, penwidth=PEN_WIDTH)
-
-        gr.edge("start", str(head_node(graph)) if len(graph.nodes) > 0 else "end", penwidth=PEN_WIDTH)
-        if end_nodes:
-            for end in end_nodes:
-                gr.edge(str(end[0]), "end", penwidth=PEN_WIDTH, label=end[1])
-        else:
-            gr.edge(str(last_node(graph)), "end", penwidth=PEN_WIDTH)
+        source = cfg_to_dot(graph, end_nodes, filename, token_stream, verbose)
+        write = write_file if sink is None else sink.write
+        write(f"{filename}-cfg.gv", source.encode("utf8"))
+        write(f"{filename}-cfg.gv.{format}", gv.Source(source, format=format).pipe())
+
+
+def cfg_to_dot(graph, end_nodes, comment, token_stream=None, verbose=True) -> str:
+    """
+    Writes the DOT source of a CFG in one pass, byte for byte the source `graphviz.Digraph` builds for it,
+    so that it can be fed to any renderer.
+    """
+    lines = [f"// {comment}\n", "digraph {\n", "\tnode [shape=none]\n", START_NODE]
+    for node, data in graph.nodes.data():
+        block_contents = (stringify_block(data, token_stream) if verbose else stringify_block_lineno_only(data))
+        lines.append(f"\t{node} [label={build_node_template(node, block_contents)}]\n")
+
+    lines.append(END_NODE)
+    for f, t, data in graph.edges.data():
+        label = data["value"] if data else ''
+        label = "" if label is None else f"label={quote(label)} "
+        lines.append(f"\t{f} -> {t} [{label}fontsize={FONT_SIZE} penwidth={PEN_WIDTH}]\n")
+
+    lines.append(f"\tstart -> {head_node(graph)} [penwidth={PEN_WIDTH}]\n")
+    if end_nodes:
+        for end in end_nodes:
+            label = "" if end[1] is None else f"label={quote(end[1])} "
+            lines.append(f"\t{end[0]} -> end [{label}penwidth={PEN_WIDTH}]\n")
+    else:
+        lines.append(f"\t{last_node(graph)} -> end [penwidth={PEN_WIDTH}]\n")
+    lines.append("}\n")
+    return "".join(lines)
+
+
+START_NODE, END_NODE = (f'\t{name} [fillcolor="#aaffaa" fontsize={FONT_SIZE} shape=oval style=filled]\n'
+                        for name in ("start", "end"))
+
+# the node template with its lines already stripped, see `strip_lines`
+NODE_TEMPLATE = (f'<<FONT POINT-SIZE="{FONT_SIZE}">\n'
+                 '<TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">\n'
+                 '<tr>\n'
+                 '<td width="50" height="50" fixedsize="true">{label}</td>\n'
+                 '<td width="9" height="9" fixedsize="true" style="invis"></td>\n'
+                 '<td width="9" height="9" fixedsize="true" style="invis"></td>\n'
+                 '</tr>\n'
+                 '<tr>\n'
+                 '<td width="50" height="{height}" fixedsize="true" sides="tlb"></td>\n'
+                 '{contents}\n'
+                 '<td width="50" height="{height}" fixedsize="true" sides="brt"></td>\n'
+                 '</tr>\n'
+                 '</TABLE>\n'
+                 '</FONT>>')
 
-        gr.render(f"{filename}-cfg.gv", view=False)
 
 def build_node_template(node_label, contents):
-    b_len = len(contents.splitlines())
-    line_height = 40
-    s = f"""<<FONT POINT-SIZE="{FONT_SIZE}">  
-        <TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">
-            <tr>
-                <td width="50" height="50" fixedsize="true">{node_label + 1}</td>
-                <td width="9" height="9" fixedsize="true" style="invis"></td>
-                <td width="9" height="9" fixedsize="true" style="invis"></td>
-            </tr>
-            <tr>
-                <td width="50" height="{b_len * line_height}" fixedsize="true" sides="tlb"></td>
-                <td width="50" height="{b_len * line_height}" fixedsize="false" sides="bt" PORT="here">{contents}</td>
-                <td width="50" height="{b_len * line_height}" fixedsize="true" sides="brt"></td>
-            </tr>
-        </TABLE>
-    </FONT>>"""
-    return strip_lines(s)
+    height = len(contents.splitlines()) * 40
+    # only the lines of the contents are left to strip
+    contents = strip_lines(f'<td width="50" height="{height}" fixedsize="false" sides="bt" PORT="here">{contents}</td>')
+    return NODE_TEMPLATE.format(label=node_label + 1, height=height, contents=contents)
 
 
 def strip_lines(x: str): return "\n".join(line.strip() for line in x.splitlines())
 
 
+HTML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+
+
 def node_content_to_html(node_contents):
     delimiter = '<br align="left"/>\n'
-    content_list_string = delimiter.join([html.escape(f"{l}: {content}") for l, content in node_contents])
+    content_list_string = delimiter.join([f"{l}: {content}".translate(HTML_ESCAPES) for l, content in node_contents])
     return content_list_string + delimiter
 
 
@@ -0,0 +1,113 @@
+"""
+Progress manifest of an extraction run, for resuming it after an interruption.
+
+The manifest is a JSON-lines file that is only appended to. A line is added when all the outputs of a source
+file are written, with the content hash of the file, the paths of its outputs and its coverage tasks, and when
+the coverage result of a method is written. Lines are committed in batches, after the outputs they point to
+are made durable, so that a line never records an output that could be lost. A run resumed from the manifest
+skips the files whose hash did not change and the coverage results already written, and redoes everything else.
+Recording a file again drops the coverage results of its methods, which were computed on its previous content.
+"""
+import json
+import os
+import time
+
+from src.code_coverage.coverage_stage import CoverageTask
+
+
+class Manifest:
+    """
+    :param path: path of the manifest file.
+    :param resume: keep the records of the previous run at `path` instead of starting an empty manifest.
+    :param outputs: `OutputSink`s, `CorpusIndex`es or any other objects with a `flush` method, flushed before
+    the records of the work they hold are committed.
+    :param interval: seconds between two commits, the most work an interruption may lose.
+    """
+
+    def __init__(self, path, resume=False, outputs=(), interval=5.0):
+        self.path, self.interval = path, interval
+        self.outputs = [output for output in outputs if output is not None]
+        self.files, self.coverage = {}, {}
+        lines = self.__load() if resume else []
+        # rewritten without the truncated last line an interruption may leave, so that new lines start cleanly
+        with open(path + ".tmp", "w", encoding="utf8") as file:
+            file.writelines(lines)
+        os.replace(path + ".tmp", path)
+        self.__file = open(path, "a", encoding="utf8")
+        self.__pending = []
+        self.__synced = time.monotonic()
+
+    def __load(self):
+        lines = []
+        try:
+            with open(self.path, encoding="utf8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if "file" in record:
+                        self.__forget_coverage(record["file"], record)
+                        self.files[record["file"]] = record
+                    else:
+                        self.coverage[record["coverage"]] = record
+                    lines.append(line)
+        except OSError:
+            pass
+        return lines
+
+    def is_done(self, file, digest) -> bool:
+        """whether all the outputs of `file` were written from a source with the content hash `digest`"""
+        record = self.files.get(file)
+        return record is not None and record["hash"] == digest
+
+    def coverage_tasks(self, file):
+        return [CoverageTask(*task) for task in self.files[file]["coverage_tasks"]]
+
+    def coverage_summary(self, output, criterion):
+        """:return: the summary of the coverage result written to `output` with `criterion`, `None` if there is none"""
+        record = self.coverage.get(output)
+        return record["summary"] if record is not None and record["criterion"] == criterion else None
+
+    def record_file(self, file, digest, outputs, coverage_tasks=()):
+        record = {"file": file, "hash": digest, "outputs": list(outputs),
+                  "coverage_tasks": [list(task) for task in coverage_tasks]}
+        self.__forget_coverage(file, record)
+        self.files[file] = record
+        self.__append(record)
+
+    def __forget_coverage(self, file, record):
+        """drops the coverage results of the previous extraction of `file`, which `record` replaces"""
+        previous = self.files.get(file, {"coverage_tasks": []})
+        for task in previous["coverage_tasks"] + record["coverage_tasks"]:
+            self.coverage.pop(CoverageTask(*task).output, None)
+
+    def record_coverage(self, output, criterion, summary):
+        self.coverage[output] = {"coverage": output, "criterion": criterion, "summary": summary}
+        self.__append(self.coverage[output])
+
+    def __append(self, record):
+        self.__pending.append(json.dumps(record) + "\n")
+        if time.monotonic() - self.__synced >= self.interval:
+            self.sync()
+
+    def sync(self):
+        """commits the pending records, after flushing the outputs they point to"""
+        if self.__pending:
+            for output in self.outputs:
+                output.flush()
+            self.__file.writelines(self.__pending)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__pending.clear()
+        self.__synced = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,61 @@
+"""
+Merges the pack exports of the shards of a run into one pack with a single index, e.g. after
+
+    python3 src/cfg_from_stdin.py project --sink pack --shard 0/2
+    python3 src/cfg_from_stdin.py project --sink pack --shard 1/2
+    python -m src.merge_shards test_output/project.pack test_output/project.shard-*-of-2.pack
+
+Entries are copied as they are, without decompressing them, and the coverage reports of the shards are
+combined into one `coverage-report.json`.
+"""
+import argparse
+import json
+import re
+import zlib
+
+from src.code_coverage.coverage_stage import merge_reports
+from src.graph.sinks import PackSink, read_pack_index
+
+SHARD_REPORT = re.compile(r"(.*/)?coverage-report\.shard-\d+-of-\d+\.json$")
+
+
+def merge_packs(path, shard_paths) -> int:
+    """
+    :return: the number of entries copied from the shards.
+    """
+    sources, reports = {}, {}
+    with PackSink(path) as merged:
+        for shard_path in shard_paths:
+            with open(shard_path, "rb") as pack:
+                for name, entry in read_pack_index(shard_path).items():
+                    pack.seek(entry["offset"])
+                    data = pack.read(entry["size"])
+                    report = SHARD_REPORT.match(name)
+                    if report:
+                        content = zlib.decompress(data) if entry["compressed"] else data
+                        reports.setdefault(f"{report.group(1) or ''}coverage-report.json", []).append(
+                            json.loads(content))
+                        continue
+                    if name in sources:
+                        raise ValueError(f"{name} is in both {sources[name]} and {shard_path}, "
+                                         f"the shards overlap")
+                    sources[name] = shard_path
+                    merged.append_entry(name, data, entry["compressed"])
+        for name, parts in reports.items():
+            merged.write(name, json.dumps(merge_reports(parts), indent=2).encode("utf8"))
+    return len(sources)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the pack files written by the shards of a run.")
+    parser.add_argument("output", help="path of the merged pack file")
+    parser.add_argument("shards", nargs="+", help="pack files of the shards")
+    args = parser.parse_args(argv)
+    if args.output in args.shards:
+        parser.error(f"{args.output} is both the output and a shard")
+    entries = merge_packs(args.output, args.shards)
+    print(f"merged {entries} entries of {len(args.shards)} shards into {args.output}")
+
+
+if __name__ == '__main__':
+    main()
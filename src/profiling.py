@@ -0,0 +1,264 @@
+"""
+Per-file and per-method profiling of an extraction run, for finding out which sources make it slow.
+
+Each file, and each method inside it, is profiled with `cProfile` as a unit of its own: opening a unit pauses
+the profile of the enclosing one, so that the profile of a method holds that method only, while the profile of
+a file also includes the profiles of its methods. Units are opened with `unit`, which does nothing unless a
+`Profiler` is installed, so that the extractors can mark their methods at no cost in ordinary runs.
+
+Worker processes profile their work with a `Profiler` of their own and send its finished units back, where
+they are merged with `Profiler.add`. At the end, the run is written as:
+
+    profile.pstats, profile.collapsed                the whole run, for `pstats` and for flame graph tools
+    slowest/<kind>/<rank>-<unit>.{pstats,collapsed}  each of the slowest files and methods
+    profile-report.txt                               the slowest units and their hottest functions
+"""
+import cProfile
+import heapq
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple
+
+# units are ranked against the units of the same kind only, since a file takes at least as long as its methods
+KINDS = ("files", "methods")
+
+_installed = None
+
+
+class Unit(NamedTuple):
+    """
+    A finished unit, which can be sent between processes.
+
+    :param kind: one of `KINDS`.
+    :param stats: the `pstats` dictionary of the unit, including the units nested in it.
+    :param top_level: whether the unit is not nested in another one, so that the profile of the run adds it up.
+    """
+    name: str
+    kind: str
+    elapsed: float
+    stats: dict
+    top_level: bool
+
+
+class _Profile:
+    """`pstats` input made of an existing `pstats` dictionary"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def combine(*stats) -> dict:
+    """:return: the `pstats` dictionary adding up the given ones"""
+    combined = pstats.Stats(_Profile(dict(stats[0])))
+    for other in stats[1:]:
+        combined.add(pstats.Stats(_Profile(dict(other))))
+    return combined.stats
+
+
+def function_label(function) -> str:
+    filename, line, name = function
+    if filename == "~":
+        # built-in functions, e.g. `<method 'append' of 'list' objects>`
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def hot_functions(stats, count=5):
+    """:return: the label, own time and cumulative time of the `count` functions taking the most own time"""
+    hottest = heapq.nlargest(count, stats.items(), key=lambda item: item[1][2])
+    return [(function_label(function), tt, ct) for function, (_, _, tt, ct, _) in hottest]
+
+
+def collapsed_stacks(stats, min_time=1e-6):
+    """
+    Reconstructs call stacks from the caller-callee edges of a `pstats` dictionary, in the collapsed stack format
+    of flame graph tools: one `root;caller;callee <microseconds>` line per stack, holding its own time.
+
+    `cProfile` only records the edges, so the time of a function called from several stacks is split between
+    them in proportion to the time each caller spent in it. Recursive calls are folded into their first frame.
+
+    :param min_time: seconds below which a stack is not expanded any further.
+    """
+    callees = defaultdict(list)
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller].append((function, edge[3]))
+    own = defaultdict(float)
+
+    def walk(function, stack, share):
+        _, _, tt, ct, _ = stats[function]
+        stack = (*stack, function)
+        own[stack] += tt * share
+        for callee, time_from_caller in callees[function]:
+            callee_time = stats[callee][3]
+            if callee in stack or not callee_time:
+                continue
+            callee_share = share * min(1.0, time_from_caller / callee_time)
+            if callee_time * callee_share >= min_time:
+                walk(callee, stack, callee_share)
+
+    for function, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(function, (), 1.0)
+    lines = []
+    for stack, seconds in own.items():
+        microseconds = round(seconds * 1e6)
+        if microseconds:
+            lines.append(f"{';'.join(function_label(function) for function in stack)} {microseconds}\n")
+    return lines
+
+
+class _OpenUnit:
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.nested = []
+
+
+class Profiler:
+    """
+    Profiles units and keeps the slowest ones of each kind.
+
+    :param top: number of slowest units of each kind kept, all of them when `None`, e.g. in worker processes.
+    """
+
+    def __init__(self, top=20):
+        self.top = top
+        self.total = {}
+        self.units = 0
+        self.__slowest = {kind: [] for kind in KINDS}
+        self.__open = []
+        # the nested units of the outermost open unit, by name, so that a method profiled in several parts
+        # (e.g. built, then drawn) is reported as one unit
+        self.__nested = {}
+
+    @contextmanager
+    def unit(self, name, kind=None):
+        """
+        profiles the block as a unit, named after the units it is nested in, e.g. `Foo.java::Foo.bar()`
+
+        :param kind: one of `KINDS`, by default the methods for nested units and the files for the others.
+        """
+        outer = self.__open[-1] if self.__open else None
+        kind = kind or ("methods" if outer is not None else "files")
+        if outer is not None:
+            outer.profile.disable()
+            name = f"{outer.name}::{name}"
+        current = _OpenUnit(name)
+        self.__open.append(current)
+        start = time.perf_counter()
+        current.profile.enable()
+        try:
+            yield
+        finally:
+            current.profile.disable()
+            elapsed = time.perf_counter() - start
+            self.__open.pop()
+            current.profile.create_stats()
+            stats = combine(current.profile.stats, *current.nested)
+            if outer is not None:
+                outer.nested.append(stats)
+                if name in self.__nested:
+                    previous = self.__nested[name]
+                    elapsed, stats = previous.elapsed + elapsed, combine(previous.stats, stats)
+                self.__nested[name] = Unit(name, kind, elapsed, stats, False)
+                outer.profile.enable()
+            else:
+                self.add([Unit(name, kind, elapsed, stats, True), *self.__nested.values()])
+                self.__nested.clear()
+
+    def add(self, units):
+        """merges finished units, e.g. the ones a worker process sent back"""
+        for unit in units:
+            self.units += 1
+            if unit.top_level:
+                self.total = combine(self.total, unit.stats) if self.total else unit.stats
+            slowest = self.__slowest[unit.kind]
+            entry = (unit.elapsed, self.units, unit)
+            if self.top is None or len(slowest) < self.top:
+                heapq.heappush(slowest, entry)
+            elif entry > slowest[0]:
+                heapq.heapreplace(slowest, entry)
+
+    def slowest(self, kind):
+        """:return: the slowest units of `kind`, slowest first"""
+        return [unit for _, _, unit in sorted(self.__slowest[kind], reverse=True)]
+
+    def take(self):
+        """:return: the units kept so far, forgetting them, to send them to another process"""
+        units = [unit for slowest in self.__slowest.values() for _, _, unit in slowest]
+        for slowest in self.__slowest.values():
+            slowest.clear()
+        return units
+
+    def report(self, hot=5):
+        lines = [f"{self.units} profiled units"]
+        for kind in KINDS:
+            lines += ["", f"slowest {kind}:"]
+            for rank, unit in enumerate(self.slowest(kind), 1):
+                lines.append(f"{rank:>3}. {unit.elapsed * 1000:10.1f} ms  {unit.name}")
+                for label, tt, ct in hot_functions(unit.stats, hot):
+                    lines.append(f"{'':>8}{tt * 1000:10.1f} ms own {ct * 1000:10.1f} ms cumulative  {label}")
+        return "\n".join(lines)
+
+    def write(self, directory, hot=5):
+        """writes the profile of the whole run, the profiles of the slowest units and the report"""
+        # deferred, since `method_keys` loads the Java lexer, which the coverage workers do not need
+        from src.cfg_extractor.method_keys import path_name
+
+        self.__write_stats(f"{directory}/profile", self.total)
+        for kind in KINDS:
+            os.makedirs(f"{directory}/slowest/{kind}", exist_ok=True)
+            for rank, unit in enumerate(self.slowest(kind), 1):
+                self.__write_stats(f"{directory}/slowest/{kind}/{rank:03}-{path_name(unit.name)}", unit.stats)
+        with open(f"{directory}/profile-report.txt", "w", encoding="utf8") as file:
+            file.write(self.report(hot) + "\n")
+
+    @staticmethod
+    def __write_stats(path, stats):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if stats:
+            pstats.Stats(_Profile(dict(stats))).dump_stats(f"{path}.pstats")
+        with open(f"{path}.collapsed", "w", encoding="utf8") as file:
+            file.writelines(collapsed_stacks(stats))
+
+
+def install(profiler):
+    """makes `unit` profile with `profiler` from now on, or not at all when it is `None`"""
+    global _installed
+    _installed = profiler
+
+
+@contextmanager
+def installed(profiler):
+    """makes `unit` profile with `profiler`, or not at all when it is `None`, within the block"""
+    global _installed
+    previous, _installed = _installed, profiler
+    try:
+        yield profiler
+    finally:
+        _installed = previous
+
+
+def unit(name, kind=None):
+    """profiles the block as a unit with the installed `Profiler`, if any"""
+    return _installed.unit(name, kind) if _installed is not None else nullcontext()
+
+
+def profiled(name, function, *args, kind="files", **kwargs):
+    """
+    Runs `function` as a unit of a `Profiler` of its own, for profiling work done in a worker process.
+
+    :return: the result of `function` and the units to pass to `Profiler.add` in the parent process.
+    """
+    with installed(Profiler(top=None)) as profiler:
+        with unit(name, kind):
+            result = function(*args, **kwargs)
+    return result, profiler.take()